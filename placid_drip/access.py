@@ -1,20 +1,144 @@
 import frappe
-from frappe.utils import now_datetime, get_datetime
+from frappe.utils import now_datetime
+
+from placid_drip import schedule
+
+
+#: Per-user map of course -> the batch that governs it, shared across requests.
+#: `frappe.cache().hget` also memoises into `frappe.local`, so repeat lookups
+#: within one request do not even reach redis.
+USER_BATCHES_KEY = "placid_drip:user_course_batches"
 
 
 def resolve_user_batch_for_course(user: str, course: str) -> str | None:
+    if not user or not course or user == "Guest":
+        return None
+
+    return get_course_batches(user).get(course)
+
+
+def get_course_batches(user: str) -> dict[str, str]:
+    """Every course this user reaches through a batch, mapped to that batch."""
+    return frappe.cache().hget(
+        USER_BATCHES_KEY,
+        user,
+        generator=lambda: _load_course_batches(user),
+    )
+
+
+def _load_course_batches(user: str) -> dict[str, str]:
+    """One query for all of the user's batches.
+
+    A member in two batches carrying the same course resolves to the batch they
+    were enrolled in most recently - a learner repeating a course follows their
+    current cohort's schedule. This used to be `LIMIT 1` with no ORDER BY, which
+    was merely arbitrary uncached and would be frozen in place by caching.
+    """
     rows = frappe.db.sql(
         """
-        SELECT e.batch
+        SELECT bc.course, e.batch
         FROM `tabLMS Batch Enrollment` e
         JOIN `tabBatch Course` bc ON bc.parent = e.batch
         WHERE e.member = %s
-          AND bc.course = %s
+          AND bc.parenttype = 'LMS Batch'
+        ORDER BY e.creation DESC, e.batch ASC
+        """,
+        (user,),
+    )
+
+    out = {}
+    for course, batch in rows:
+        if course:
+            out.setdefault(course, batch)
+    return out
+
+
+def clear_course_batches(users) -> None:
+    """Drop the cached map for `users`, now and again once the write commits."""
+    users = [u for u in set(users or []) if u]
+    if not users:
+        return
+
+    frappe.cache().hdel(USER_BATCHES_KEY, users)
+    frappe.db.after_commit.add(lambda: frappe.cache().hdel(USER_BATCHES_KEY, users))
+
+
+def clear_batch_members(batch: str) -> None:
+    """Invalidate every member of `batch`, e.g. after its course list changed."""
+    if not batch:
+        return
+
+    clear_course_batches(
+        frappe.get_all("LMS Batch Enrollment", filters={"batch": batch}, pluck="member")
+    )
+
+def get_lesson_gate(user: str, course: str, chapter_idx: int, lesson_idx: int) -> frappe._dict:
+    """Everything `get_lesson` needs before it can decide, in one statement.
+
+    Resolves the outline position to its chapter and lesson the same way LMS
+    does, and whether `user` evaluates or instructs `course` - either of which
+    bypasses the drip lock. That used to be four separate round-trips per click.
+    The membership batch and the lock row come from the per-user and per-batch
+    caches, so on a warm cache this is the only query the gate issues.
+
+    The anchor row keeps the bypass flags available even when the position does
+    not resolve to a lesson.
+    """
+    row = frappe.db.sql(
+        """
+        SELECT
+            cr.chapter AS chapter,
+            lr.lesson AS lesson,
+            EXISTS(
+                SELECT 1 FROM `tabBatch Course` bc
+                WHERE bc.parenttype = 'LMS Batch'
+                  AND bc.course = %(course)s
+                  AND bc.evaluator = %(user)s
+            ) AS is_evaluator,
+            EXISTS(
+                SELECT 1 FROM `tabCourse Instructor` ci
+                WHERE ci.parenttype = 'LMS Course'
+                  AND ci.parentfield = 'instructors'
+                  AND ci.parent = %(course)s
+                  AND ci.instructor = %(user)s
+            ) AS is_instructor
+        FROM (SELECT 1) AS anchor
+        LEFT JOIN `tabChapter Reference` cr
+            ON cr.parent = %(course)s AND cr.idx = %(chapter_idx)s
+        LEFT JOIN `tabLesson Reference` lr
+            ON lr.parent = cr.chapter AND lr.idx = %(lesson_idx)s
         LIMIT 1
         """,
-        (user, course),
+        {
+            "user": user,
+            "course": course,
+            "chapter_idx": int(chapter_idx),
+            "lesson_idx": int(lesson_idx),
+        },
+        as_dict=True,
+    )[0]
+
+    return frappe._dict(
+        chapter=row.get("chapter"),
+        lesson=row.get("lesson"),
+        bypass=bool(row.get("is_evaluator") or row.get("is_instructor")),
     )
-    return rows[0][0] if rows else None
+
+
+def lesson_lock_state(user: str, course: str, lesson_name: str) -> tuple[bool, str | None, str | None]:
+    """
+    Returns (locked, opens_at_str, reason) for a student opening `lesson_name`.
+    Batch and schedule are both cache reads.
+    """
+    batch = resolve_user_batch_for_course(user, course)
+    if not batch:
+        return True, None, "Not enrolled in a batch for this course."
+
+    row = schedule.get_entry(batch, course, lesson_name, user)
+    locked, opens, reason = schedule.lock_state(row, now_datetime())
+
+    return locked, (str(opens) if opens else None), reason
+
 
 def can_access_lesson(user: str, course: str, lesson_name: str):
     """
@@ -29,12 +153,7 @@ def can_access_lesson(user: str, course: str, lesson_name: str):
     if not batch:
         return False, "You are not enrolled in a batch for this course.", None
 
-    row = frappe.db.get_value(
-        "Batch Lesson Access",
-        {"batch": batch, "lesson": lesson_name},
-        ["available_from", "force_lock"],
-        as_dict=True,
-    )
+    row = schedule.get_entry(batch, course, lesson_name, user)
 
     # No schedule row => allow by default (non-breaking)
     if not row:
@@ -43,8 +162,8 @@ def can_access_lesson(user: str, course: str, lesson_name: str):
     if row.get("force_lock"):
         return False, "This lesson is locked by your cohort schedule.", None
 
-    available_from = get_datetime(row.get("available_from"))
-    if available_from and now < available_from:
-        return False, f"Opens on {available_from}", available_from
+    locked, available_from, reason = schedule.lock_state(row, now)
+    if locked:
+        return False, reason, available_from
 
     return True, None, None
\ No newline at end of file
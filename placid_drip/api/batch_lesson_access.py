@@ -4,21 +4,18 @@ from frappe.utils import now_datetime
 from frappe.utils.data import get_datetime
 import lms.lms.utils as lms_utils
 
-from placid_drip.facilitator import (
-    can_manage_batch_course,
-    get_facilitated_batch_names,
-    get_instructed_course_names,
-)
+from placid_drip import schedule
+from placid_drip.facilitator import can_manage_batch_course
+from placid_drip.principal import get_principal
 
 
 @frappe.whitelist()
 @frappe.validate_and_sanitize_search_inputs
 def get_evaluator_batches(doctype, txt, searchfield, start, page_len, filters=None):
-    user = frappe.session.user
-    roles = frappe.get_roles(user)
+    principal = get_principal()
 
     # bypass for admins
-    if user == "Administrator" or "System Manager" in roles or "Moderator" in roles:
+    if principal.is_staff:
         return frappe.db.sql("""
             select name, title
             from `tabLMS Batch`
@@ -28,7 +25,7 @@ def get_evaluator_batches(doctype, txt, searchfield, start, page_len, filters=No
         """, {"txt": f"%{txt}%", "start": start, "page_len": page_len})
 
     # Batches the user evaluates OR instructs (previously evaluator-only).
-    names = get_facilitated_batch_names(user)
+    names = principal.facilitated_batches
     if not names:
         return []
 
@@ -45,15 +42,15 @@ def get_evaluator_batches(doctype, txt, searchfield, start, page_len, filters=No
 @frappe.whitelist()
 @frappe.validate_and_sanitize_search_inputs
 def get_evaluator_courses(doctype, txt, searchfield, start, page_len, filters=None):
-    user = frappe.session.user
-    roles = frappe.get_roles(user)
+    principal = get_principal()
+    user = principal.user
     batch = (filters or {}).get("batch")
 
     if not batch:
         return []
 
     # Admin/moderator/system manager: show ALL courses in that batch
-    if user == "Administrator" or "System Manager" in roles or "Moderator" in roles:
+    if principal.is_staff:
         return frappe.db.sql(
             """
             SELECT DISTINCT
@@ -78,8 +75,8 @@ def get_evaluator_courses(doctype, txt, searchfield, start, page_len, filters=No
 
     # Courses in that batch the user evaluates, instructs, or that sit in a batch
     # they instruct. Previously evaluator-only, so instructors saw an empty list.
-    instructs_batch = batch in get_facilitated_batch_names(user)
-    instructed_courses = get_instructed_course_names(user) or [""]
+    instructs_batch = batch in principal.facilitated_batches
+    instructed_courses = list(principal.instructed_courses) or [""]
 
     return frappe.db.sql(
         """
@@ -143,27 +140,22 @@ def get_batch_course_lock_details(batch: str, course: str):
 
     outline = outline or []
 
-    lesson_names = [
-        l.get("name")
-        for ch in outline
-        for l in (ch.get("lessons") or [])
-        if l.get("name")
-    ]
-
-    locks_by_lesson = {}
-    if lesson_names:
-        rows = frappe.get_all(
-            "Batch Lesson Access",
-            filters={"batch": batch, "lesson": ["in", lesson_names]},
-            fields=["name", "lesson", "available_from", "force_lock"],
-            limit_page_length=0,
-        )
-        for r in rows:
-            locks_by_lesson[r["lesson"]] = {
-                "name": r["name"],
-                "available_from": str(r["available_from"]) if r.get("available_from") else None,
-                "force_lock": int(r.get("force_lock") or 0),
-            }
+    # Rows are unique per (batch, course, lesson), so the batch+course filter is
+    # already exactly the outline's rows - no need to walk it for an IN-list.
+    rows = frappe.get_all(
+        "Batch Lesson Access",
+        filters={"batch": batch, "course": course},
+        fields=["name", "lesson", "available_from", "force_lock"],
+        limit_page_length=0,
+    )
+    locks_by_lesson = {
+        r["lesson"]: {
+            "name": r["name"],
+            "available_from": str(r["available_from"]) if r.get("available_from") else None,
+            "force_lock": int(r.get("force_lock") or 0),
+        }
+        for r in rows
+    }
 
     return {
         "batch": batch,
@@ -227,52 +219,140 @@ def bulk_save_batch_lesson_access(batch: str, course: str, changes):
     if not lesson_names:
         return {"inserted": 0, "updated": 0, "deleted": 0}
 
+    return apply_lesson_access_changes(batch, course, normalized)
+
+
+def apply_lesson_access_changes(
+    batch: str, course: str, normalized: list[dict], schedule_template: str | None = None
+) -> dict:
+    """Upsert/delete many Batch Lesson Access rows in a handful of statements.
+
+    Used to be one `get_doc().insert`, `set_value` or `delete_doc` per lesson,
+    each insert re-running `BatchLessonAccess.validate` - an `exists` plus the
+    three queries of `can_manage_batch_course` - so scheduling a 120-lesson
+    course cost hundreds of queries. The caller authorises once up front; here
+    uniqueness is settled in memory (the last change for a lesson wins, as it
+    did when the loop applied them in order) and the writes go out as one
+    DELETE, one UPDATE and one multi-row INSERT. All of it runs inside the
+    request's transaction, so a failure leaves nothing half-applied.
+
+    Rows are written directly, so the controller hooks do not fire: names follow
+    `BatchLessonAccess.autoname`, and the compiled schedule is dropped here.
+
+    Every written row is stamped with `schedule_template` - `None` for a hand
+    edit, which is what detaches a row from the template that wrote it.
+    """
+    by_lesson = {}
+    for row in normalized:
+        by_lesson[row["lesson"]] = row
+
     # fetch existing docnames once (not diffing values; just to know what to update/delete)
     existing = frappe.get_all(
         "Batch Lesson Access",
-        filters={"batch": batch, "course": course, "lesson": ["in", lesson_names]},
+        filters={"batch": batch, "course": course, "lesson": ["in", list(by_lesson)]},
         fields=["name", "lesson"],
         limit_page_length=0,
     )
     existing_by_lesson = {r["lesson"]: r["name"] for r in existing}
 
-    inserted = updated = deleted = 0
-
-    for row in normalized:
-        lesson = row["lesson"]
-        available_from = row["available_from"]
-        force_lock = row["force_lock"]
+    to_delete, to_update, to_insert = [], [], []
+    written = []
 
+    for lesson, row in by_lesson.items():
         name = existing_by_lesson.get(lesson)
+        available_from = get_datetime(row["available_from"]) if row["available_from"] else None
+        force_lock = row["force_lock"]
 
         # Clear row => delete if exists
         if not available_from and not force_lock:
             if name:
-                frappe.delete_doc("Batch Lesson Access", name, ignore_permissions=True)
-                deleted += 1
+                to_delete.append(name)
             continue
 
+        written.append(lesson)
         if name:
-            frappe.db.set_value(
-                "Batch Lesson Access",
-                name,
-                {"course": course, "available_from": available_from, "force_lock": force_lock},
-                update_modified=True,
-            )
-            updated += 1
+            to_update.append((name, available_from, force_lock))
         else:
-            doc = frappe.get_doc(
-                {
-                    "doctype": "Batch Lesson Access",
-                    "batch": batch,
-                    "course": course,  # ✅ REQUIRED
-                    "lesson": lesson,
-                    "available_from": available_from,
-                    "force_lock": force_lock,
-                }
-            )
-            doc.insert(ignore_permissions=True)
-            inserted += 1
-            existing_by_lesson[lesson] = doc.name
+            to_insert.append((lesson, available_from, force_lock))
+
+    # Only rows being written: a stale row - say, its lesson has since moved to
+    # another course - must still be clearable.
+    _validate_lessons(course, written)
+
+    now = now_datetime()
+    user = frappe.session.user
+
+    if to_delete:
+        frappe.db.delete("Batch Lesson Access", {"name": ["in", to_delete]})
+
+    if to_update:
+        _bulk_update(course, schedule_template, to_update, now, user)
+
+    if to_insert:
+        frappe.db.bulk_insert(
+            "Batch Lesson Access",
+            fields=[
+                "name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+                "batch", "course", "lesson", "available_from", "force_lock", "schedule_template",
+            ],
+            values=[
+                (
+                    f"{batch}::{course}::{lesson}", now, now, user, user, 0, 0,
+                    batch, course, lesson, available_from, force_lock, schedule_template,
+                )
+                for lesson, available_from, force_lock in to_insert
+            ],
+        )
+
+    schedule.clear_schedule(batch, course)
 
-    return {"inserted": inserted, "updated": updated, "deleted": deleted}
\ No newline at end of file
+    return {"inserted": len(to_insert), "updated": len(to_update), "deleted": len(to_delete)}
+
+
+def _validate_lessons(course: str, lessons: list[str]):
+    """What link validation on insert used to catch: every lesson must exist in `course`."""
+    if not lessons:
+        return
+
+    known = set(
+        frappe.get_all(
+            "Course Lesson",
+            filters={"name": ["in", lessons], "course": course},
+            pluck="name",
+        )
+    )
+    unknown = [l for l in lessons if l not in known]
+    if unknown:
+        frappe.throw(
+            _("Not lessons of {0}: {1}").format(course, ", ".join(unknown)),
+            frappe.ValidationError,
+        )
+
+
+def _bulk_update(course: str, schedule_template: str | None, rows: list[tuple], now, user):
+    """One UPDATE for every changed row, values picked per name with CASE."""
+    available_from_cases = " ".join(["WHEN %s THEN %s"] * len(rows))
+    force_lock_cases = " ".join(["WHEN %s THEN %s"] * len(rows))
+    names = [name for name, _af, _fl in rows]
+
+    values = []
+    for name, available_from, _fl in rows:
+        values += [name, available_from]
+    for name, _af, force_lock in rows:
+        values += [name, force_lock]
+    values += [course, schedule_template, now, user, tuple(names)]
+
+    frappe.db.sql(
+        f"""
+        UPDATE `tabBatch Lesson Access`
+        SET
+            available_from = CASE name {available_from_cases} END,
+            force_lock = CASE name {force_lock_cases} END,
+            course = %s,
+            schedule_template = %s,
+            modified = %s,
+            modified_by = %s
+        WHERE name IN %s
+        """,
+        values,
+    )
@@ -1,7 +1,8 @@
 import frappe
 from frappe import _
 
-from placid_drip.facilitator import get_facilitated_batch_names
+from placid_drip import quiz_index, submissions
+from placid_drip.principal import get_principal
 
 DT_BATCH = "LMS Batch"
 DT_BATCH_COURSE = "Batch Course"
@@ -13,29 +14,15 @@ DT_RESULT = "LMS Quiz Result"
 
 
 def _is_admin_or_moderator(user: str) -> bool:
-    roles = set(frappe.get_roles(user))
-    return user == "Administrator" or ("System Manager" in roles) or ("Moderator" in roles)
+    return get_principal(user).is_staff
 
 
 def _can_access_batch(user: str, batch: str) -> bool:
     # Evaluators AND instructors, not evaluators only.
-    if _is_admin_or_moderator(user):
+    principal = get_principal(user)
+    if principal.is_staff:
         return True
-    return batch in get_facilitated_batch_names(user)
-
-
-def _get_batch_student_ids(batch: str) -> list[str]:
-    """Members enrolled in the batch.
-
-    This used to read `LMS Batch.students`, a field that does not exist - students
-    moved to the LMS Batch Enrollment doctype. It therefore always returned an
-    empty list, which made `list_batch_quiz_submissions` always return [].
-    """
-    return frappe.get_all(
-        "LMS Batch Enrollment",
-        filters={"batch": batch},
-        pluck="member",
-    )
+    return batch in principal.facilitated_batches
 
 
 @frappe.whitelist()
@@ -56,54 +43,38 @@ def list_batch_quizzes(batch: str):
     if not courses:
         return []
 
-    # quiz_id is the common field on Course Lesson
-    # If your field differs, change `quiz_id` below.
-    quiz_rows = frappe.db.sql(
-        """
-        SELECT DISTINCT
-            l.quiz_id AS quiz,
-            q.title AS title
-        FROM `tabCourse Lesson` l
-        JOIN `tabLMS Quiz` q ON q.name = l.quiz_id
-        WHERE
-            l.course IN %(courses)s
-            AND IFNULL(l.quiz_id, '') != ''
-        ORDER BY q.modified DESC
-        """,
-        {"courses": tuple(courses)},
-        as_dict=True,
-    )
+    # Same catalogue as quiz_reports.get_course_quizzes, so embedded quizzes
+    # are listed too and both pickers agree. One entry per quiz, in course order.
+    quizzes = {}
+    for course in courses:
+        for row in quiz_index.get_course_quizzes(course):
+            quizzes.setdefault(row["quiz"], row["quiz_title"])
 
-    return [{"name": r["quiz"], "title": r.get("title")} for r in quiz_rows if r.get("quiz")]
+    return [{"name": quiz, "title": title} for quiz, title in quizzes.items()]
 
 
 @frappe.whitelist()
-def list_batch_quiz_submissions(batch: str, quiz: str):
+def list_batch_quiz_submissions(batch: str, quiz: str, cursor: str | None = None, page_length: int | None = None):
+    """Submissions to `quiz` by the batch's members, one keyset page at a time.
+
+    Returns `{"rows": [...], "next_cursor": ...}`, newest first; pass
+    `next_cursor` back as `cursor` for the next page (see
+    `placid_drip.submissions.get_page`). `page_length` defaults to
+    `submissions.PAGE_LENGTH` - the whole list is never read in one go.
+    """
     user = frappe.session.user
     if not batch or not quiz:
         frappe.throw(_("batch and quiz are required"))
     if not _can_access_batch(user, batch):
         frappe.throw(_("Not permitted"))
 
-    student_ids = _get_batch_student_ids(batch)
-    if not student_ids:
-        return []
-
-    # Most common fieldnames:
-    # - quiz: Link to LMS Quiz
-    # - member: user id
-    fields = ["name", "member", "quiz", "score", "percentage", "status", "creation", "modified"]
-
-    # If your doctype doesn't have some fields, Frappe will throw.
-    # If that happens, run get_meta and adjust the list.
-    rows = frappe.get_all(
-        DT_SUBMISSION,
-        filters={"quiz": quiz, "member": ["in", student_ids]},
-        fields=fields,
-        order_by="modified desc",
-        limit_page_length=0,
+    return submissions.get_page(
+        batch,
+        [quiz],
+        ["name", "member", "quiz", "score", "percentage", "status", "creation", "modified"],
+        cursor=cursor,
+        page_length=page_length,
     )
-    return rows
 
 
 @frappe.whitelist()
@@ -124,4 +95,62 @@ def get_submission_results(submission: str):
         limit_page_length=0,
     )
 
-    return {"submission": sub.as_dict(), "results": results}
\ No newline at end of file
+    return {"submission": sub.as_dict(), "results": results}
+
+
+@frappe.whitelist()
+def get_batch_submission_results(batch: str, submissions=None, quiz: str | None = None):
+    """Many submissions and their results at once, for reviewing a batch.
+
+    Pass `submissions` (a list, or a JSON list, of ids) or `quiz`. Returns the same
+    `{"submission", "results"}` shape as `get_submission_results`, one per
+    submission, newest first - in two queries whatever the count.
+
+    Permission is checked once, against the batch; only submissions by the batch's
+    members are returned, so an id from outside it is simply absent.
+    """
+    user = frappe.session.user
+    if not batch:
+        frappe.throw(_("batch is required"))
+    if not _can_access_batch(user, batch):
+        frappe.throw(_("Not permitted"))
+
+    if isinstance(submissions, str):
+        submissions = frappe.parse_json(submissions)
+    submissions = [s for s in (submissions or []) if s]
+
+    if not submissions and not quiz:
+        frappe.throw(_("submissions or quiz is required"))
+
+    conditions = ["s.member IN (SELECT member FROM `tabLMS Batch Enrollment` WHERE batch = %(batch)s)"]
+    if submissions:
+        conditions.append("s.name IN %(submissions)s")
+    if quiz:
+        conditions.append("s.quiz = %(quiz)s")
+
+    # Roster as a subquery, so scoping to the batch costs no extra round-trip.
+    subs = frappe.db.sql(
+        f"""
+        SELECT s.*
+        FROM `tabLMS Quiz Submission` s
+        WHERE {" AND ".join(conditions)}
+        ORDER BY s.creation DESC
+        """,
+        {"batch": batch, "submissions": tuple(submissions), "quiz": quiz},
+        as_dict=True,
+    )
+    if not subs:
+        return []
+
+    # LMS Quiz Result is the submission's child table.
+    results_by_submission = {}
+    for r in frappe.get_all(
+        DT_RESULT,
+        filters={"parenttype": DT_SUBMISSION, "parent": ["in", [s.name for s in subs]]},
+        fields=["name", "parent", "question", "is_correct", "marks", "answer", "correct_answer", "creation"],
+        order_by="parent asc, idx asc",
+        limit_page_length=0,
+    ):
+        results_by_submission.setdefault(r.pop("parent"), []).append(r)
+
+    return [{"submission": s, "results": results_by_submission.get(s.name, [])} for s in subs]
\ No newline at end of file
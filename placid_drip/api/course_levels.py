@@ -17,6 +17,7 @@ import frappe
 from frappe.rate_limiter import rate_limit
 
 from placid_drip.constants import RATE_LIMIT, RATE_LIMIT_WINDOW
+from placid_drip.principal import get_principal
 
 LEVEL_FIELDS = ["name", "level_name", "sequence", "description", "image"]
 
@@ -33,12 +34,11 @@ def _sees_unpublished(user: str) -> bool:
 	Unpublished tab will see a subset of their count - the tile deliberately
 	reports the whole level rather than tracking the tab.
 	"""
-	if user == "Administrator":
+	principal = get_principal(user)
+	if principal.is_administrator:
 		return True
 
-	return bool(
-		set(frappe.get_roles(user)) & {"System Manager", "Moderator", "Course Creator", "Batch Evaluator"}
-	)
+	return principal.has_any_role({"System Manager", "Moderator", "Course Creator", "Batch Evaluator"})
 
 
 def _course_filters(user: str) -> dict:
@@ -5,6 +5,7 @@ from placid_drip.facilitator import (
 	get_courses_for_batches,
 	get_facilitated_batches,
 )
+from placid_drip.principal import get_principal
 
 
 def get_batch_details(batch_name: str):
@@ -26,8 +27,7 @@ def get_my_evaluator_batches(with_courses: bool = False):
 	if user == "Guest":
 		return []
 
-	roles = frappe.get_roles(user)
-	if user == "Administrator" or "System Manager" in roles or "Moderator" in roles:
+	if get_principal(user).is_staff:
 		meta = frappe.get_meta("LMS Batch")
 		fields = [f for f in BATCH_FIELDS if f == "name" or meta.has_field(f)]
 		batches = frappe.get_all(
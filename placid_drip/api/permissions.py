@@ -1,6 +1,7 @@
 import frappe
 
-from placid_drip.facilitator import get_facilitated_batch_names, is_staff
+from placid_drip.facilitator import is_staff
+from placid_drip.principal import get_principal
 
 
 def is_system_staff():
@@ -27,5 +28,5 @@ def require_batch_access(batch: str):
 	if is_system_staff():
 		return
 
-	if batch not in get_facilitated_batch_names(frappe.session.user):
+	if batch not in get_principal().facilitated_batches:
 		frappe.throw("Not permitted for this batch.", frappe.PermissionError)
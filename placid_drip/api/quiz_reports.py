@@ -1,21 +1,29 @@
 import json
 import frappe
 from frappe import _
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import wrap_file
+
+from placid_drip import quiz_analytics, quiz_index, submissions
+from placid_drip.api.batch_quiz_submissions import _can_access_batch
+from placid_drip.principal import get_principal
+
+#: Moderators, instructors (Course Creator) and evaluators may read quiz reports.
+REPORT_ROLES = {"Moderator", "Course Creator", "Batch Evaluator"}
+
 
 def _require_staff(batch: str):
     # Keep this simple for now; tighten later if you want “only batch instructors/evaluators”
-    user = frappe.session.user
-    if user == "Guest":
+    principal = get_principal()
+    if principal.is_guest or not principal.has_any_role(REPORT_ROLES):
+        frappe.throw(_("Not permitted"), frappe.PermissionError)
+
+
+def _require_batch_access(batch: str):
+    """For whole-batch reports: a report role, and facilitating this batch."""
+    _require_staff(batch)
+    if not _can_access_batch(frappe.session.user, batch):
         frappe.throw(_("Not permitted"), frappe.PermissionError)
-    if frappe.db.exists("Has Role", {"parent": user, "role": "Moderator"}):
-        return
-    # allow instructors
-    if frappe.db.exists("Has Role", {"parent": user, "role": "Course Creator"}):
-        return
-    # optionally allow evaluators
-    if frappe.db.exists("Has Role", {"parent": user, "role": "Batch Evaluator"}):
-        return
-    frappe.throw(_("Not permitted"), frappe.PermissionError)
 
 
 @frappe.whitelist()
@@ -37,72 +45,11 @@ def get_course_quizzes(course: str):
     if frappe.session.user == "Guest":
         frappe.throw(_("Not permitted"), frappe.PermissionError)
 
-    lessons = frappe.get_all(
-        "Course Lesson",
-        filters={"course": course},
-        fields=["name", "title", "quiz_id", "content"],
-        order_by="creation asc",
-    )
-
-    found = []
-    seen = set()
-
-    def add_quiz(qid: str, lesson_name: str, lesson_title: str, source: str):
-        if not qid:
-            return
-        key = (qid, lesson_name)
-        if key in seen:
-            return
-        seen.add(key)
-        found.append({
-            "quiz": qid,
-            "lesson": lesson_name,
-            "lesson_title": lesson_title,
-            "source": source,  # "quiz_id" or "content"
-        })
-
-    for l in lessons:
-        # A) Course Lesson.quiz_id
-        if l.quiz_id:
-            add_quiz(l.quiz_id, l.name, l.title, "quiz_id")
-
-        # B) EditorJS blocks
-        if l.content:
-            try:
-                doc = json.loads(l.content)
-                for b in (doc.get("blocks") or []):
-                    if b.get("type") == "quiz":
-                        qid = (b.get("data") or {}).get("quiz")
-                        add_quiz(qid, l.name, l.title, "content")
-            except Exception:
-                # ignore bad JSON
-                pass
-
-    # Optionally enrich with Quiz title
-    quiz_names = list({x["quiz"] for x in found})
-    quiz_titles = {}
-    if quiz_names:
-        for q in frappe.get_all("LMS Quiz", filters={"name": ["in", quiz_names]}, fields=["name", "title"]):
-            quiz_titles[q.name] = q.title
-
-    for x in found:
-        x["quiz_title"] = quiz_titles.get(x["quiz"]) or x["quiz"]
-
-    return found
+    # Lesson Quiz Index catalogue, cached per course - no lesson bodies parsed here
+    return quiz_index.get_course_quizzes(course)
 
 
-@frappe.whitelist()
-def get_batch_quiz_submissions(batch: str, quiz: str = None, quizzes=None, quizzes_json: str = None):
-    """
-    Returns quiz submissions for members in a batch.
-
-    Accepts any of:
-      - quiz: single quiz id (string)
-      - quizzes: list of quiz ids (list or json-string)
-      - quizzes_json: legacy json string list
-    """
-    _require_staff(batch)
-
+def _parse_quiz_ids(quiz=None, quizzes=None, quizzes_json=None) -> list[str]:
     quiz_ids = []
 
     # 1) single quiz
@@ -130,55 +77,93 @@ def get_batch_quiz_submissions(batch: str, quiz: str = None, quizzes=None, quizz
             quiz_ids = []
 
     # normalize / clean
-    quiz_ids = [q for q in (quiz_ids or []) if q]
-    if not quiz_ids:
-        return []
+    return [q for q in (quiz_ids or []) if q]
 
-    # Members in this batch
-    members = frappe.get_all(
-        "LMS Batch Enrollment",
-        filters={"batch": batch},
-        pluck="member",
-    )
-    if not members:
-        return []
-
-    # Pull submissions
-    subs = frappe.get_all(
-        "LMS Quiz Submission",
-        filters={
-            "quiz": ["in", quiz_ids],
-            "member": ["in", members],
-        },
-        fields=[
-            "name",
-            "quiz",
-            "member",
-            "score",
-            "percentage",
-            "creation",
-            "modified",
-            # include pass/status if these fields exist in your doctype:
-            # "pass",
-            # "status",
-        ],
-        order_by="creation desc",
-        limit_page_length=5000,
+
+@frappe.whitelist()
+def get_batch_quiz_submissions(
+    batch: str,
+    quiz: str | None = None,
+    quizzes=None,
+    quizzes_json: str | None = None,
+    cursor: str | None = None,
+    page_length: int | None = None,
+):
+    """
+    Returns quiz submissions for members in a batch, one keyset page at a time.
+
+    Accepts any of:
+      - quiz: single quiz id (string)
+      - quizzes: list of quiz ids (list or json-string)
+      - quizzes_json: legacy json string list
+
+    The response is `{"rows": [...], "next_cursor": ...}`, newest first; pass
+    `next_cursor` back as `cursor` for the next page, which is `None` after the
+    last (see `placid_drip.submissions.get_page`). `page_length` defaults to
+    `submissions.PAGE_LENGTH`. This used to return a bare list cut off at 5000
+    rows with nothing to say so.
+    """
+    _require_batch_access(batch)
+
+    quiz_ids = _parse_quiz_ids(quiz, quizzes, quizzes_json)
+    if not quiz_ids:
+        return {"rows": [], "next_cursor": None}
+
+    return submissions.get_page(
+        batch,
+        quiz_ids,
+        ["name", "quiz", "member", "score", "percentage", "creation", "modified"],
+        cursor=cursor,
+        page_length=page_length,
     )
 
-    # Optional: map member -> full name (User doc)
-    member_ids = list({s["member"] for s in subs if s.get("member")})
-    full_names = {}
-    if member_ids:
-        for u in frappe.get_all(
-            "User",
-            filters={"name": ["in", member_ids]},
-            fields=["name", "full_name"],
-        ):
-            full_names[u["name"]] = u.get("full_name")
 
-    for s in subs:
-        s["member_name"] = full_names.get(s["member"]) or s["member"]
+@frappe.whitelist()
+def get_batch_gradebook(batch: str):
+    """Students x quizzes matrix for the batch - see `quiz_analytics.get_gradebook`.
+
+    Replaces one `get_batch_quiz_submissions` call per quiz and a pivot in the
+    browser; cached per batch until a member submits again.
+    """
+    if not batch:
+        frappe.throw(_("batch is required"))
+    _require_batch_access(batch)
+
+    return quiz_analytics.get_gradebook(batch)
+
+
+@frappe.whitelist()
+def get_batch_quiz_statistics(batch: str, quiz: str | None = None, quizzes=None):
+    """Per-quiz mean, median, percentiles, pass rate and per-question correctness.
+
+    All of the batch's quizzes unless `quiz`/`quizzes` narrow it. See
+    `quiz_analytics.get_quiz_statistics`.
+    """
+    if not batch:
+        frappe.throw(_("batch is required"))
+    _require_batch_access(batch)
+
+    statistics = quiz_analytics.get_quiz_statistics(batch)
+
+    wanted = _parse_quiz_ids(quiz, quizzes)
+    if wanted:
+        return {q: statistics[q] for q in wanted if q in statistics}
+    return statistics
+
+
+@frappe.whitelist()
+def export_batch_quiz_submissions(batch: str, quiz: str | None = None, quizzes=None, file_format: str = "csv"):
+    """Every submission for these quizzes in the batch, as a CSV or XLSX download."""
+    _require_batch_access(batch)
+
+    quiz_ids = _parse_quiz_ids(quiz, quizzes)
+    if not quiz_ids:
+        frappe.throw(_("Select at least one quiz."))
 
-    return subs
+    spool, mimetype = submissions.export(batch, quiz_ids, file_format)
 
+    # Served from the spool rather than from the database, which is closed by the
+    # time the body is sent.
+    response = Response(wrap_file(frappe.local.request.environ, spool), mimetype=mimetype, direct_passthrough=True)
+    response.headers["Content-Disposition"] = f'attachment; filename="{batch}-quiz-submissions.{file_format}"'
+    return response
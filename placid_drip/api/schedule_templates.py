@@ -0,0 +1,38 @@
+"""Applying a drip schedule template to many batches in one go.
+
+The logic lives in `placid_drip.schedule_templates`; this is only the
+whitelisted surface and its scope check.
+"""
+
+import frappe
+from frappe import _
+
+from placid_drip import schedule_templates
+
+
+@frappe.whitelist()
+def apply_schedule_template(template, batches):
+	"""Write `template`'s schedule into every batch in `batches`.
+
+	`batches` may be a list or a JSON list. The caller must be able to schedule
+	the template's course in every one of them - checked for all of them before
+	anything is written, so a forbidden batch cannot leave the rest half done.
+	"""
+	if frappe.session.user == "Guest":
+		frappe.throw(_("Please log in."), frappe.PermissionError)
+
+	batches = frappe.parse_json(batches) if isinstance(batches, str) else batches
+	if isinstance(batches, str):
+		batches = [batches]
+	batches = [b for b in (batches or []) if b]
+
+	if not template or not batches:
+		frappe.throw(_("A template and at least one batch are required."))
+
+	course = frappe.db.get_value("Drip Schedule Template", template, "course")
+	if not course:
+		frappe.throw(_("Unknown schedule template: {0}").format(template))
+
+	schedule_templates.assert_can_apply(course, batches, frappe.session.user)
+
+	return schedule_templates.apply_template(template, batches)
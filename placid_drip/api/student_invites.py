@@ -8,8 +8,9 @@ start disagreeing about which batches belong to whom.
 
 import frappe
 from frappe import _
+from frappe.utils import cint
 
-from placid_drip import invites
+from placid_drip import batch_enrollment, invites
 from placid_drip.facilitator import get_facilitated_batches, is_staff
 
 INVITE_FIELDS = ["name", "email", "status", "invited_by", "accepted_user", "accepted_on", "creation"]
@@ -37,12 +38,16 @@ def get_invitable_batches():
 
 
 @frappe.whitelist()
-def send_invites(emails, batches):
+def send_invites(emails, batches, background=0):
 	"""Invite a pasted list of addresses into one or more batches.
 
 	`emails` may be a blob of comma / semicolon / newline / space separated
 	addresses, or a list. Returns a per-address breakdown rather than a bare
 	count, because "37 invited" hides the three typos that silently did nothing.
+
+	With `background`, the list is worked through by a job instead and this
+	returns `{job, total, invalid, event}` at once; per-address outcomes arrive on
+	the realtime `event`, and `get_invite_job` returns the same breakdown so far.
 	"""
 	_assert_signed_in()
 
@@ -50,9 +55,64 @@ def send_invites(emails, batches):
 	if isinstance(batches, str):
 		batches = [batches]
 
+	if cint(background):
+		return invites.start_invite_job(emails, batches or [])
+
 	return invites.send_invites(emails, batches or [])
 
 
+@frappe.whitelist()
+def get_invite_job(name):
+	"""Where a background invite run has got to - for a UI polling rather than listening."""
+	_assert_signed_in()
+	job = frappe.get_doc("Student Invite Job", name)
+
+	if job.owner != frappe.session.user and not is_staff(frappe.session.user):
+		frappe.throw(_("Not permitted"), frappe.PermissionError)
+
+	return {
+		"job": job.name,
+		"status": job.status,
+		"total": job.total,
+		"processed": job.processed,
+		"result": frappe.parse_json(job.result),
+		"error": job.error,
+	}
+
+
+@frappe.whitelist()
+def enroll_students(members, batches):
+	"""Enrol existing users into batches in one pass - moving a cohort, say.
+
+	Same batch scoping as `send_invites`. Returns member -> `{batches, courses}`
+	newly enrolled into; users that do not exist are listed under `unknown`.
+	"""
+	_assert_signed_in()
+
+	members = frappe.parse_json(members) if isinstance(members, str) else members
+	batches = frappe.parse_json(batches) if isinstance(batches, str) else batches
+	if isinstance(batches, str):
+		batches = [batches]
+	batches = [b for b in dict.fromkeys(batches or []) if b]
+
+	if not batches:
+		frappe.throw(_("Select at least one batch."))
+
+	missing = [b for b in batches if not frappe.db.exists("LMS Batch", b)]
+	if missing:
+		frappe.throw(_("Unknown batch: {0}").format(", ".join(missing)))
+
+	invites.assert_can_invite(batches, frappe.session.user)
+
+	members = [m for m in dict.fromkeys(members or []) if m]
+	known = set(frappe.get_all("User", filters={"name": ["in", members]}, pluck="name")) if members else set()
+
+	return {
+		"enrolled": batch_enrollment.enroll_members([m for m in members if m in known], batches),
+		"unknown": [m for m in members if m not in known],
+	}
+
+
 @frappe.whitelist()
 def get_invites(status=None, batch=None):
 	"""Invites the current user is allowed to see, newest first."""
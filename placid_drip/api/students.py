@@ -15,7 +15,7 @@ import frappe
 from frappe import _
 
 from placid_drip import membership
-from placid_drip.facilitator import get_facilitated_batch_names, is_staff
+from placid_drip.principal import get_principal
 
 
 @frappe.whitelist()
@@ -28,8 +28,9 @@ def get_my_students():
 	if frappe.session.user == "Guest":
 		frappe.throw(_("Please log in."), frappe.PermissionError)
 
-	user = frappe.session.user
-	batch_names = None if is_staff(user) else get_facilitated_batch_names(user)
+	principal = get_principal()
+	user = principal.user
+	batch_names = None if principal.is_staff else principal.facilitated_batches
 
 	rows = {}
 	_add_batch_members(rows, batch_names)
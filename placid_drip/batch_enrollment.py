@@ -0,0 +1,144 @@
+"""Putting many people into many batches at once.
+
+Enrolling one member in one batch goes through an `LMS Batch Enrollment` insert,
+whose after_insert then enrols that member into each of the batch's courses one
+by one. That is right for one student and ruinous for a cohort: moving 300
+people into a new batch is thousands of document inserts, each with its own
+hooks and permission checks.
+
+`enroll_members` does the same job set-wise. One query finds which (member,
+batch) pairs already exist, the missing ones go in as multi-row inserts, and
+`enroll_members_in_batch_courses` - the function the backfill patch uses, and
+the one the doctype's own hook calls - enrols each batch's new members into its
+courses in one call per batch. Each batch is written under its own savepoint, so
+a batch that fails is rolled back and logged without stranding the others.
+
+Only the course enrolments and this app's own caches are handled here; the
+rows are written directly, so no other `LMS Batch Enrollment` hook fires for
+them.
+"""
+
+import frappe
+from frappe.utils import now_datetime
+from lms.lms.doctype.lms_batch_enrollment.lms_batch_enrollment import (
+	enroll_members_in_batch_courses,
+)
+
+from placid_drip import access
+from placid_drip.quiz_analytics import clear_batch_reports
+
+#: Rows per INSERT statement.
+INSERT_CHUNK = 500
+
+#: User columns copied onto the enrollment, which a document insert would fetch.
+FETCHED_FIELDS = {"member_name": "full_name", "member_username": "username"}
+
+
+def enroll_members(
+	members: list[str], batches: list[str], enrolled: dict[str, set[str]] | None = None
+) -> dict[str, dict]:
+	"""Enrol every member into every batch they are not already in.
+
+	Returns member -> `{"batches": [...], "courses": [...]}`, the batches and
+	courses each member was newly enrolled into; both are empty for a member who
+	already had everything, or whose batch failed. `enrolled`, when the caller
+	has already fetched it, is member -> the batches among `batches` they are in.
+	Callers are responsible for authorisation.
+	"""
+	members = [m for m in dict.fromkeys(members or []) if m]
+	batches = [b for b in dict.fromkeys(batches or []) if b]
+	result = {m: {"batches": [], "courses": []} for m in members}
+	if not members or not batches:
+		return result
+
+	if enrolled is None:
+		enrolled = {}
+		for member, batch in frappe.get_all(
+			"LMS Batch Enrollment",
+			filters={"member": ["in", members], "batch": ["in", batches]},
+			fields=["member", "batch"],
+			as_list=True,
+		):
+			enrolled.setdefault(member, set()).add(batch)
+
+	added = []
+	for batch in batches:
+		new_members = [m for m in members if batch not in enrolled.get(m, ())]
+		if not new_members:
+			continue
+
+		created = _enroll_batch(batch, new_members)
+		if created is None:
+			continue
+
+		added.append(batch)
+		for member in new_members:
+			result[member]["batches"].append(batch)
+			result[member]["courses"].extend(created.get(member) or [])
+
+	# What the per-row after_insert in cache_invalidation would have dropped.
+	access.clear_course_batches([m for m, r in result.items() if r["batches"]])
+	clear_batch_reports(added)
+
+	return result
+
+
+def _enroll_batch(batch: str, members: list[str]) -> dict | None:
+	"""Insert `members` into `batch` and its courses. None if it failed and was rolled back.
+
+	One failing batch must not strand the others, but it must not vanish either -
+	a silently half-applied enrolment is worse than a loud one.
+	"""
+	savepoint = f"batch_enrollment_{frappe.generate_hash(length=8)}"
+	frappe.db.savepoint(savepoint)
+
+	try:
+		_insert(batch, members)
+		created = enroll_members_in_batch_courses(batch, members) or {}
+	except Exception:
+		frappe.db.rollback(save_point=savepoint)
+		frappe.log_error(
+			title="Bulk batch enrollment failed",
+			message=f"batch={batch} members={len(members)}\n\n{frappe.get_traceback()}",
+		)
+		return None
+
+	frappe.db.release_savepoint(savepoint)
+	return created
+
+
+def _insert(batch: str, members: list[str]) -> None:
+	meta = frappe.get_meta("LMS Batch Enrollment")
+	fetched = {field: column for field, column in FETCHED_FIELDS.items() if meta.has_field(field)}
+
+	users = {}
+	if fetched:
+		users = {
+			u.name: u
+			for u in frappe.get_all(
+				"User",
+				filters={"name": ["in", members]},
+				fields=["name", *fetched.values()],
+			)
+		}
+
+	now = now_datetime()
+	owner = frappe.session.user
+	frappe.db.bulk_insert(
+		"LMS Batch Enrollment",
+		fields=["name", "creation", "modified", "owner", "modified_by", "member", "batch", *fetched],
+		values=[
+			(
+				frappe.generate_hash(length=10),
+				now,
+				now,
+				owner,
+				owner,
+				member,
+				batch,
+				*(users.get(member, {}).get(column) for column in fetched.values()),
+			)
+			for member in members
+		],
+		chunk_size=INSERT_CHUNK,
+	)
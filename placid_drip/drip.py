@@ -1,24 +1,18 @@
 import frappe
 from frappe.utils import now_datetime
 
-def is_lesson_available(batch: str, lesson: str) -> bool:
+from placid_drip import schedule
+
+
+def is_lesson_available(batch: str, lesson: str, user: str | None = None) -> bool:
     """
-    Batch-level drip:
-    - If no schedule row exists -> allow (non-breaking default)
-    - If force_lock checked -> deny
+    Batch-level drip, as the compiled schedule sees it:
+    - If neither a rule nor a row covers the lesson -> allow (non-breaking default)
+    - If force_lock checked, or the previous lesson is still pending -> deny
     - Else allow only if now >= available_from
     """
-    row = frappe.db.get_value(
-        "Batch Lesson Access",
-        {"batch": batch, "lesson": lesson},
-        ["available_from", "force_lock"],
-        as_dict=True,
-    )
-
-    if not row:
-        return True  # default policy; change to False if you want "locked unless scheduled"
-
-    if row.get("force_lock"):
-        return False
+    course = frappe.db.get_value("Course Lesson", lesson, "course")
+    entry = schedule.get_entry(batch, course, lesson, user)
 
-    return now_datetime() >= row.get("available_from")
\ No newline at end of file
+    locked, _opens, _reason = schedule.lock_state(entry, now_datetime())
+    return not locked
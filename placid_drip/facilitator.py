@@ -6,10 +6,18 @@ A user facilitates a batch if either:
 
 Both the facilitator home page and the Batches list go through here so the two
 never disagree about what "my batches" means.
+
+The answer is held per user in redis. It is asked for several times per request
+on the facilitator pages - every batch-scope check goes through it - and only
+changes when a batch is saved or loses a course, at which point the whole index
+is dropped: a save also bumps `modified`, which reorders everyone's list, not
+just the list of whoever was added or removed.
 """
 
 import frappe
 
+from placid_drip.principal import get_principal
+
 # Everything BatchCard.vue actually reads, minus the values it computes itself.
 BATCH_FIELDS = [
 	"name",
@@ -28,11 +36,11 @@ BATCH_FIELDS = [
 	"currency",
 ]
 
+FACILITATED_BATCHES_KEY = "placid_drip:facilitated_batches"
+
 
 def is_staff(user: str) -> bool:
-	return user == "Administrator" or bool(
-		set(frappe.get_roles(user)) & {"System Manager", "Moderator"}
-	)
+	return get_principal(user).is_staff
 
 
 def can_manage_batch_course(user: str, batch: str, course: str) -> bool:
@@ -99,10 +107,27 @@ def get_instructed_course_names(user: str) -> list[str]:
 
 
 def get_facilitated_batch_names(user: str) -> list[str]:
-	"""Batch names this user evaluates or instructs, most recently modified first."""
+	"""Batch names this user evaluates or instructs, most recently modified first.
+
+	Shared with other readers in the same request, so treat it as read-only.
+	"""
 	if not user or user == "Guest":
 		return []
 
+	return frappe.cache().hget(
+		FACILITATED_BATCHES_KEY,
+		user,
+		generator=lambda: _load_facilitated_batch_names(user),
+	)
+
+
+def clear_facilitated_batches() -> None:
+	"""Drop every user's index, now and again once the write commits."""
+	frappe.cache().delete_key(FACILITATED_BATCHES_KEY)
+	frappe.db.after_commit.add(lambda: frappe.cache().delete_key(FACILITATED_BATCHES_KEY))
+
+
+def _load_facilitated_batch_names(user: str) -> list[str]:
 	as_evaluator = frappe.get_all(
 		"Batch Course",
 		filters={"parenttype": "LMS Batch", "evaluator": user},
@@ -19,6 +19,9 @@ override_whitelisted_methods = {
   # surface Organization, which upstream's hardcoded User field lists omit
   "lms.lms.api.get_profile_details": "placid_drip.overrides.lms_api.get_profile_details",
   "lms.lms.utils.get_batch_students": "placid_drip.overrides.lms_utils.get_batch_students",
+  # outline reorders write idx directly; rule-based schedules follow the outline
+  "lms.lms.api.update_chapter_index": "placid_drip.overrides.lms_api.update_chapter_index",
+  "lms.lms.api.update_lesson_index": "placid_drip.overrides.lms_api.update_lesson_index",
 }
 
 doc_events = {
@@ -29,16 +32,73 @@ doc_events = {
         "after_insert": "placid_drip.invites.accept_for_user",
     },
     "LMS Batch Enrollment": {
-        "on_trash": "placid_drip.triggered_events.batch_cleanup.on_batch_enrollment_removed",
+        "after_insert": "placid_drip.triggered_events.cache_invalidation.on_batch_enrollment_change",
+        "on_trash": [
+            "placid_drip.triggered_events.batch_cleanup.on_batch_enrollment_removed",
+            "placid_drip.triggered_events.cache_invalidation.on_batch_enrollment_change",
+        ],
+    },
+    "LMS Batch": {
+        "on_update": [
+            "placid_drip.triggered_events.cache_invalidation.on_batch_update",
+            # template-written lesson dates follow a moved start date
+            "placid_drip.schedule_templates.on_batch_update",
+        ],
+        "on_trash": "placid_drip.triggered_events.cache_invalidation.on_batch_trash",
+    },
+    "Batch Course": {
+        "on_trash": "placid_drip.triggered_events.cache_invalidation.on_batch_course_trash",
+    },
+    # rule-based drip schedules are laid out by outline position
+    "LMS Course": {
+        "on_update": "placid_drip.triggered_events.cache_invalidation.on_course_outline_change",
+    },
+    "Course Chapter": {
+        "on_update": "placid_drip.triggered_events.cache_invalidation.on_course_outline_change",
+        "on_trash": "placid_drip.triggered_events.cache_invalidation.on_course_outline_change",
+    },
+    # keeps Lesson Quiz Index - quiz -> lesson - and the course catalogue current
+    "Course Lesson": {
+        "on_update": [
+            "placid_drip.quiz_index.on_lesson_update",
+            # a course's lesson total feeds every enrollment's progress
+            "placid_drip.progress.on_lesson_update",
+            "placid_drip.triggered_events.cache_invalidation.on_course_outline_change",
+        ],
+        "on_trash": [
+            "placid_drip.quiz_index.on_lesson_trash",
+            "placid_drip.progress.on_lesson_trash",
+            "placid_drip.triggered_events.cache_invalidation.on_course_outline_change",
+        ],
+    },
+    # LMS Enrollment.completed_lessons moves with each completed lesson
+    "LMS Course Progress": {
+        "on_update": "placid_drip.progress.on_progress_update",
+        "on_trash": "placid_drip.progress.on_progress_trash",
+    },
+    # quiz titles appear in the cached course -> quizzes catalogue
+    "LMS Quiz": {
+        "on_update": "placid_drip.quiz_index.on_quiz_change",
+        "on_trash": "placid_drip.quiz_index.on_quiz_change",
     },
     "LMS Quiz Submission": {
         "after_insert": "placid_drip.triggered_events.lesson_quiz_progress_cleanup.on_quiz_submission_after_insert",
+        # on_update also fires on insert; drops the member's batch reports
+        "on_update": "placid_drip.quiz_analytics.on_submission_change",
+        "on_trash": "placid_drip.quiz_analytics.on_submission_change",
         # (optional) if your system updates same submission doc later:
         # "on_update": "placid_drip.lms.quiz_progress.on_quiz_submitted",
     }
 }
 
 
+scheduler_events = {
+    # mail students the lessons that opened since the last run
+    "hourly": [
+        "placid_drip.unlock_notifications.notify_unlocked_lessons",
+    ],
+}
+
 after_install = "placid_drip.website_bootstrap.set_home_to_lms"
 after_migrate = "placid_drip.website_bootstrap.set_home_to_lms"
 
@@ -231,6 +291,9 @@ after_migrate = "placid_drip.website_bootstrap.set_home_to_lms"
 
 # ignore_links_on_delete = ["Communication", "ToDo"]
 
+# Lesson Quiz Index is derived from lessons; it must never block deleting one.
+ignore_links_on_delete = ["Lesson Quiz Index"]
+
 # Request Events
 # ----------------
 # before_request = ["placid_drip.utils.before_request"]
@@ -16,13 +16,16 @@ the batch's courses too: `LMSBatchEnrollment.after_insert` already calls
 `enroll_member_in_batch_courses`. That is exactly the step the stock invite skips.
 """
 
+import json
 import re
 
 import frappe
 from frappe import _
 from frappe.utils import get_url, now_datetime, validate_email_address
+from redis.exceptions import RedisError
 
-from placid_drip.facilitator import get_facilitated_batch_names, is_staff
+from placid_drip import batch_enrollment
+from placid_drip.principal import get_principal
 
 #: Anything a human might paste between addresses: commas, semicolons, newlines,
 #: tabs or plain spaces. Pasting a column out of a spreadsheet has to just work.
@@ -33,6 +36,17 @@ SPLIT_PATTERN = re.compile(r"[,;\s]+")
 #: address, so it never reaches the splitter and gets reported as a bad address.
 ANGLE_PATTERN = re.compile(r'(?:"[^"]*"\s*|[^,;<>]*)<([^<>@\s]+@[^<>@\s]+)>')
 
+#: Addresses a background invite job works through per enqueued chunk.
+INVITE_CHUNK = 25
+
+INVITE_PROGRESS_EVENT = "placid_drip_invite_progress"
+
+#: Every address with a pending invite, plus `PENDING_EMAILS_LOADED` once the set
+#: has been filled from the table. The marker lives inside the set so that the
+#: cache evicting the set takes the marker with it.
+PENDING_EMAILS_KEY = "placid_drip:pending_invite_emails"
+PENDING_EMAILS_LOADED = ""
+
 
 def parse_emails(raw) -> tuple[list[str], list[str]]:
 	"""Split a pasted blob into (valid, invalid) address lists.
@@ -70,10 +84,11 @@ def parse_emails(raw) -> tuple[list[str], list[str]]:
 
 def get_invitable_batches(user: str) -> list[str] | None:
 	"""Batches `user` may invite into. `None` means "no restriction"."""
-	if is_staff(user):
+	principal = get_principal(user)
+	if principal.is_staff:
 		return None
 
-	return get_facilitated_batch_names(user)
+	return principal.facilitated_batches
 
 
 def assert_can_invite(batches: list[str], user: str) -> None:
@@ -134,19 +149,32 @@ def enroll_in_batches(member: str, batches: list[str]) -> list[str]:
 	return added
 
 
+#: `create_or_update_invite` was not told whether a pending invite exists.
+_UNKNOWN = object()
+
+
 def _existing_pending_invite(email: str):
 	name = frappe.db.exists("Student Invite", {"email": email, "status": "Pending"})
 	return frappe.get_doc("Student Invite", name) if name else None
 
 
-def create_or_update_invite(email: str, batches: list[str]):
+def create_or_update_invite(email: str, batches: list[str], pending=_UNKNOWN):
 	"""One pending invite per address, accumulating batches on re-invite.
 
 	Re-inviting somebody who is already pending adds the new batches to the
 	existing invite instead of creating a second one, so a second invite cannot
 	quietly supersede the batches named by the first.
+
+	`pending` is the prefetched `(name, batches)` of that invite, or `None` when
+	the caller knows there is none. With it, an invite that already names every
+	batch is not touched at all and comes back as its name rather than a doc.
 	"""
-	invite = _existing_pending_invite(email)
+	if pending is _UNKNOWN:
+		invite = _existing_pending_invite(email)
+	elif pending and set(batches) <= pending[1]:
+		return pending[0], False
+	else:
+		invite = frappe.get_doc("Student Invite", pending[0]) if pending else None
 
 	if invite:
 		known = set(invite.batch_names())
@@ -165,36 +193,84 @@ def create_or_update_invite(email: str, batches: list[str]):
 	return invite, True
 
 
-def send_invite_email(invite) -> bool:
+def send_invite_email(invite, mailer: "InviteMailer | None" = None) -> bool:
 	"""Best-effort delivery. Returns whether it was handed to the mail queue.
 
 	Never raises: a mail failure must not roll back the invite, because the UI
 	offers the link for copying and the invite is perfectly usable without the
-	email ever arriving.
+	email ever arriving. Pass one `mailer` for every email of a send.
 	"""
-	try:
-		batch_titles = [
-			frappe.db.get_value("LMS Batch", row.batch, "title") or row.batch
-			for row in invite.batches
-		]
-
-		frappe.sendmail(
-			recipients=[invite.email],
-			subject=_("You have been invited to join {0}").format(
-				frappe.db.get_single_value("Website Settings", "app_name") or "Placid Academy"
-			),
-			message=_invite_email_body(invite, batch_titles),
-			reference_doctype=invite.doctype,
-			reference_name=invite.name,
-			retry=3,
-		)
-		return True
-	except Exception:
-		frappe.log_error(
-			title="Student invite email failed",
-			message=f"invite={invite.name} email={invite.email}\n\n{frappe.get_traceback()}",
+	return (mailer or InviteMailer()).send(invite)
+
+
+def get_batch_titles(invite, titles: dict | None = None) -> list[str]:
+	"""Titles of `invite`'s batches, in row order.
+
+	Read from the rows' `batch_title`, fetched when the invite was saved; a row
+	without one is looked up, all such rows in one query. `titles` carries those
+	lookups across invites.
+	"""
+	titles = {} if titles is None else titles
+	missing = [row.batch for row in invite.batches if row.batch and not row.batch_title and row.batch not in titles]
+	if missing:
+		titles.update(
+			frappe.get_all("LMS Batch", filters={"name": ["in", missing]}, fields=["name", "title"], as_list=True)
 		)
-		return False
+
+	return [row.batch_title or titles.get(row.batch) or row.batch for row in invite.batches]
+
+
+class InviteMailer:
+	"""Invite emails for one send: subject and body built once, each recipient filled in.
+
+	A bulk invite names the same few batches for every address, so the titles
+	are resolved and the body rendered once per distinct set of batches, and each
+	email only substitutes its own link and address into that.
+	"""
+
+	#: Stand-ins substituted per recipient; never valid in a title, since titles are escaped.
+	URL_SLOT = "<!--invite_url-->"
+	EMAIL_SLOT = "<!--invite_email-->"
+
+	def __init__(self):
+		self.titles = {}
+		self.bodies = {}
+		self.subject = None
+
+	def send(self, invite) -> bool:
+		try:
+			frappe.sendmail(
+				recipients=[invite.email],
+				subject=self._subject(),
+				message=self._body(get_batch_titles(invite, self.titles))
+				.replace(self.URL_SLOT, invite.invite_url)
+				.replace(self.EMAIL_SLOT, frappe.utils.escape_html(invite.email)),
+				reference_doctype=invite.doctype,
+				reference_name=invite.name,
+				retry=3,
+			)
+			return True
+		except Exception:
+			frappe.log_error(
+				title="Student invite email failed",
+				message=f"invite={invite.name} email={invite.email}\n\n{frappe.get_traceback()}",
+			)
+			return False
+
+	def _subject(self) -> str:
+		if self.subject is None:
+			self.subject = _("You have been invited to join {0}").format(
+				frappe.db.get_single_value("Website Settings", "app_name") or "Placid Academy"
+			)
+		return self.subject
+
+	def _body(self, batch_titles: list[str]) -> str:
+		key = tuple(batch_titles)
+		if key not in self.bodies:
+			self.bodies[key] = _invite_email_body(
+				frappe._dict(invite_url=self.URL_SLOT, email=self.EMAIL_SLOT), batch_titles
+			)
+		return self.bodies[key]
 
 
 def _invite_email_body(invite, batch_titles: list[str]) -> str:
@@ -214,6 +290,84 @@ def _invite_email_body(invite, batch_titles: list[str]) -> str:
 
 def send_invites(emails, batches: list[str]) -> dict:
 	"""Invite each address to each batch. See `api.student_invites.send_invites`."""
+	batches, valid, invalid = _prepare_invites(emails, batches)
+
+	result = _empty_result(invalid)
+	for email, outcomes in invite_addresses(valid, batches):
+		_record(result, email, outcomes)
+
+	return result
+
+
+def invite_addresses(emails: list[str], batches: list[str]) -> list[tuple[str, list[str]]]:
+	"""`invite_address` for each of `emails`, as (email, outcomes) in input order.
+
+	Addresses that already have an account are enrolled together through
+	`batch_enrollment.enroll_members` rather than one batch row at a time.
+	"""
+	known = prefetch_invite_state(emails, batches)
+
+	existing = {email: known.users[email] for email in emails if email in known.users}
+	enrolled = batch_enrollment.enroll_members(list(existing.values()), batches, known.enrolled)
+
+	outcomes = []
+	for email in emails:
+		if email in existing:
+			added = enrolled[existing[email]]["batches"]
+			outcomes.append((email, ["enrolled" if added else "already_enrolled"]))
+		else:
+			outcomes.append((email, invite_address(email, batches, known)))
+
+	return outcomes
+
+
+def prefetch_invite_state(emails: list[str], batches: list[str]) -> frappe._dict:
+	"""Everything `invite_address` would look up per address, for all of them at once.
+
+	- `users`: email -> existing User
+	- `pending`: email -> (pending Student Invite, set of its batches)
+	- `enrolled`: user -> set of `batches` they are already in
+	- `mailer`: one `InviteMailer` for any fallback emails the list needs
+
+	Three queries for the whole paste, so the per-address loop only writes.
+	"""
+	users = {
+		(u.email or "").lower(): u.name
+		for u in frappe.get_all("User", filters={"email": ["in", emails]}, fields=["name", "email"])
+	}
+
+	pending = {}
+	for email, name, batch in frappe.db.sql(
+		"""
+		SELECT i.email, i.name, b.batch
+		FROM `tabStudent Invite` i
+		LEFT JOIN `tabStudent Invite Batch` b
+			ON b.parent = i.name AND b.parenttype = 'Student Invite'
+		WHERE i.email IN %(emails)s AND i.status = 'Pending'
+		ORDER BY i.creation ASC
+		""",
+		{"emails": tuple(emails)},
+	):
+		# Keep the first invite seen per address; there should only ever be one.
+		entry = pending.setdefault((email or "").lower(), (name, set()))
+		if entry[0] == name and batch:
+			entry[1].add(batch)
+
+	enrolled = {}
+	if users:
+		for member, batch in frappe.get_all(
+			"LMS Batch Enrollment",
+			filters={"member": ["in", list(users.values())], "batch": ["in", batches]},
+			fields=["member", "batch"],
+			as_list=True,
+		):
+			enrolled.setdefault(member, set()).add(batch)
+
+	return frappe._dict(users=users, pending=pending, enrolled=enrolled, mailer=InviteMailer())
+
+
+def _prepare_invites(emails, batches: list[str]) -> tuple[list[str], list[str], list[str]]:
+	"""Everything checked before a single address is touched: (batches, valid, invalid)."""
 	user = frappe.session.user
 	batches = [b for b in dict.fromkeys(batches or []) if b]
 
@@ -230,7 +384,11 @@ def send_invites(emails, batches: list[str]) -> dict:
 	if not valid:
 		frappe.throw(_("No valid email addresses found."))
 
-	result = {
+	return batches, valid, invalid
+
+
+def _empty_result(invalid: list[str]) -> dict:
+	return {
 		"invited": [],
 		"enrolled": [],
 		"already_enrolled": [],
@@ -239,36 +397,125 @@ def send_invites(emails, batches: list[str]) -> dict:
 		"account_failed": [],
 	}
 
-	for email in valid:
-		existing_user = frappe.db.exists("User", {"email": email})
 
-		if existing_user:
-			# They already have an account, so there is nothing to wait for - enrol
-			# them now rather than sending a signup link they do not need.
-			added = enroll_in_batches(existing_user, batches)
-			(result["enrolled"] if added else result["already_enrolled"]).append(email)
-			continue
+def _record(result: dict, email: str, outcomes: list[str]) -> None:
+	for outcome in outcomes:
+		result[outcome].append(email)
+
+
+def invite_address(email: str, batches: list[str], known: frappe._dict | None = None) -> list[str]:
+	"""Invite one address. Returns the result buckets it lands in.
 
-		# The invite row is written before the account so that the User.after_insert
-		# hook finds it and does the enrolment - one code path, whether the account
-		# is created here or by an admin in Desk later.
+	Usually one; an address whose account could not be created and whose
+	fallback email also failed lands in both `account_failed` and `email_failed`.
+	`known` is `prefetch_invite_state` for a list this address is part of.
+	"""
+	if known is None:
+		existing_user = frappe.db.exists("User", {"email": email})
+	else:
+		existing_user = known.users.get(email)
+
+	if existing_user:
+		# They already have an account, so there is nothing to wait for - enrol
+		# them now rather than sending a signup link they do not need.
+		enrolled = batch_enrollment.enroll_members([existing_user], batches, known and known.enrolled)
+		return ["enrolled" if enrolled[existing_user]["batches"] else "already_enrolled"]
+
+	# The invite row is written before the account so that the User.after_insert
+	# hook finds it and does the enrolment - one code path, whether the account
+	# is created here or by an admin in Desk later.
+	if known is None:
 		invite, _created = create_or_update_invite(email, batches)
+	else:
+		invite, _created = create_or_update_invite(email, batches, known.pending.get(email))
 
-		try:
-			create_account(email)
-			result["invited"].append(email)
-		except Exception:
-			frappe.log_error(
-				title="Student invite account creation failed",
-				message=f"email={email}\n\n{frappe.get_traceback()}",
+	try:
+		create_account(email)
+		return ["invited"]
+	except Exception:
+		frappe.log_error(
+			title="Student invite account creation failed",
+			message=f"email={email}\n\n{frappe.get_traceback()}",
+		)
+		# Fall back to the link, which still works if signup is ever re-enabled
+		# or an admin creates the account by hand.
+		if isinstance(invite, str):
+			invite = frappe.get_doc("Student Invite", invite)
+		if not send_invite_email(invite, known.mailer if known is not None else None):
+			return ["account_failed", "email_failed"]
+		return ["account_failed"]
+
+
+def start_invite_job(emails, batches: list[str]) -> dict:
+	"""Queue a pasted list for the background instead of inviting it in this request.
+
+	Validation and authorisation still happen here, so a bad batch or a forbidden
+	one fails immediately as it does inline. The addresses are then worked
+	through `INVITE_CHUNK` at a time, one job per chunk, each committing before
+	it queues the next. Every address's outcome is published on
+	`INVITE_PROGRESS_EVENT` as it happens, and the `Student Invite Job` record
+	carries the running breakdown for a UI that polls instead.
+	"""
+	batches, valid, invalid = _prepare_invites(emails, batches)
+
+	job = frappe.new_doc("Student Invite Job")
+	job.batches = json.dumps(batches)
+	job.emails = json.dumps(valid)
+	job.total = len(valid)
+	job.result = json.dumps(_empty_result(invalid))
+	job.insert(ignore_permissions=True)
+
+	_enqueue_invite_chunk(job.name, 0, after_commit=True)
+
+	return {"job": job.name, "total": len(valid), "invalid": invalid, "event": INVITE_PROGRESS_EVENT}
+
+
+def run_invite_chunk(job: str, offset: int) -> None:
+	"""Background half of `start_invite_job`: one chunk, then queue the next."""
+	doc = frappe.get_doc("Student Invite Job", job)
+	if doc.status in ("Completed", "Failed"):
+		return
+
+	emails = json.loads(doc.emails)
+	batches = json.loads(doc.batches)
+	result = frappe.parse_json(doc.result)
+	chunk = emails[offset : offset + INVITE_CHUNK]
+
+	try:
+		for i, (email, outcomes) in enumerate(invite_addresses(chunk, batches), start=offset + 1):
+			_record(result, email, outcomes)
+			frappe.publish_realtime(
+				INVITE_PROGRESS_EVENT,
+				{"job": job, "email": email, "outcomes": outcomes, "processed": i, "total": len(emails)},
+				user=doc.owner,
+				after_commit=True,
 			)
-			result["account_failed"].append(email)
-			# Fall back to the link, which still works if signup is ever re-enabled
-			# or an admin creates the account by hand.
-			if not send_invite_email(invite):
-				result["email_failed"].append(email)
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(title="Student invite job failed", message=f"job={job}\n\n{frappe.get_traceback()}")
+		doc.db_set({"status": "Failed", "error": _("Stopped after {0} of {1} addresses.").format(offset, len(emails))})
+		frappe.db.commit()
+		return
 
-	return result
+	processed = offset + len(chunk)
+	finished = processed >= len(emails)
+	doc.db_set(
+		{"status": "Completed" if finished else "Running", "processed": processed, "result": json.dumps(result)}
+	)
+	frappe.db.commit()
+
+	if not finished:
+		_enqueue_invite_chunk(job, processed)
+
+
+def _enqueue_invite_chunk(job: str, offset: int, after_commit: bool = False) -> None:
+	frappe.enqueue(
+		"placid_drip.invites.run_invite_chunk",
+		queue="long",
+		enqueue_after_commit=after_commit,
+		job=job,
+		offset=offset,
+	)
 
 
 def create_account(email: str):
@@ -315,8 +562,10 @@ def _name_from_email(email: str) -> str:
 def accept_for_user(doc, method=None) -> None:
 	"""`User.after_insert` hook: apply any pending invite for this address.
 
-	Runs for every new User on the site, so it exits immediately when there is no
-	pending invite - which is the overwhelmingly common case.
+	Runs for every new User on the site - a Data Import of thousands included - so
+	the common case of no invite is answered from `PENDING_EMAILS_KEY` without a
+	query. A match is applied by `apply_pending_invites` once the user is
+	committed, not inside their insert.
 	"""
 	email = (doc.email or doc.name or "").strip().lower()
 	if not email:
@@ -328,7 +577,23 @@ def accept_for_user(doc, method=None) -> None:
 	if frappe.flags.in_install or frappe.flags.in_migrate:
 		return
 
-	if not frappe.db.table_exists("Student Invite"):
+	if not has_pending_invite(email):
+		return
+
+	frappe.enqueue(
+		"placid_drip.invites.apply_pending_invites",
+		queue="default",
+		job_id=f"invite_accept::{doc.name}",
+		deduplicate=True,
+		enqueue_after_commit=True,
+		user=doc.name,
+		email=email,
+	)
+
+
+def apply_pending_invites(user: str, email: str) -> None:
+	"""Background half of `accept_for_user`: enrol `user` and mark their invites Accepted."""
+	if not frappe.db.exists("User", user):
 		return
 
 	pending = frappe.get_all(
@@ -336,19 +601,83 @@ def accept_for_user(doc, method=None) -> None:
 		filters={"email": email, "status": "Pending"},
 		pluck="name",
 	)
-	if not pending:
-		return
 
 	for name in pending:
 		invite = frappe.get_doc("Student Invite", name)
 
-		enroll_in_batches(doc.name, invite.batch_names())
+		enroll_in_batches(user, invite.batch_names())
 
 		invite.status = "Accepted"
-		invite.accepted_user = doc.name
+		invite.accepted_user = user
 		invite.accepted_on = now_datetime()
 		invite.save(ignore_permissions=True)
 
+	frappe.db.commit()
+
+
+def has_pending_invite(email: str) -> bool:
+	"""Whether `email` may have a pending invite, answered from redis.
+
+	The set can only err towards yes - an address is added the moment its invite
+	is written and removed only once no pending invite for it is committed - so
+	a no is final and a yes costs `apply_pending_invites` one query to confirm.
+	With redis unreachable this asks the table instead.
+	"""
+	try:
+		cache = frappe.cache()
+		if not cache.sismember(PENDING_EMAILS_KEY, PENDING_EMAILS_LOADED):
+			_load_pending_emails()
+
+		return bool(cache.sismember(PENDING_EMAILS_KEY, email))
+	except RedisError:
+		frappe.log_error(title="Pending invite cache unavailable", message=frappe.get_traceback())
+		return bool(
+			frappe.db.table_exists("Student Invite")
+			and frappe.db.exists("Student Invite", {"email": email, "status": "Pending"})
+		)
+
+
+def _load_pending_emails() -> None:
+	if not frappe.db.table_exists("Student Invite"):
+		return
+
+	emails = frappe.get_all("Student Invite", filters={"status": "Pending"}, pluck="email", distinct=True)
+
+	# One SADD, so the marker never lands without the addresses. Anything added by
+	# `pending_email_changed` meanwhile is kept; a set is a union.
+	frappe.cache().sadd(PENDING_EMAILS_KEY, PENDING_EMAILS_LOADED, *emails)
+
+
+def pending_email_changed(email: str, pending: bool) -> None:
+	"""Keep `PENDING_EMAILS_KEY` in step with a Student Invite write.
+
+	Added at once, so an account created later in the same transaction - as
+	`invite_address` does - already sees it. Removed only after commit, and only if
+	no other pending invite for the address remains. Adding to an evicted set
+	does not mark it loaded, so the next reader still refills it.
+	"""
+	if not email:
+		return
+
+	if pending:
+		_update_pending_emails("sadd", email)
+		return
+
+	def _drop():
+		if not frappe.db.exists("Student Invite", {"email": email, "status": "Pending"}):
+			_update_pending_emails("srem", email)
+
+	frappe.db.after_commit.add(_drop)
+
+
+def _update_pending_emails(op: str, email: str) -> None:
+	try:
+		getattr(frappe.cache(), op)(PENDING_EMAILS_KEY, email)
+	except RedisError:
+		# An invite must still save with redis down. A restarted redis comes back
+		# empty and is reloaded from the table; a missed remove only costs a query.
+		frappe.log_error(title="Pending invite cache unavailable", message=frappe.get_traceback())
+
 
 def get_invite_url(key: str) -> str:
 	return f"{get_url()}/invite?key={key}"
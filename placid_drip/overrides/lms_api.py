@@ -4,8 +4,11 @@ import frappe
 from frappe import _
 from lms.lms import api as lms_api
 
-from placid_drip.facilitator import get_facilitated_batch_names, is_staff
+from placid_drip import quiz_index, schedule
+from placid_drip.facilitator import is_staff
 from placid_drip.membership import attach_organization
+from placid_drip.principal import get_principal
+from placid_drip.triggered_events.batch_cleanup import remove_batch_course_enrollments
 
 #: Doctypes a facilitator may delete through `delete_documents`, mapped to the
 #: field that leads back to the batch owning the document. Everything else still
@@ -22,6 +25,16 @@ BATCH_FIELD_BY_DOCTYPE = {
 
 FACILITATOR_DELETABLE = set(BATCH_FIELD_BY_DOCTYPE)
 
+#: Requests larger than this are deleted by a background job, so clearing a
+#: whole roster does not hold (and time out) the HTTP request.
+BACKGROUND_THRESHOLD = 25
+
+#: Documents deleted per transaction in the background job; progress is
+#: published after each chunk commits.
+DELETE_CHUNK = 50
+
+PROGRESS_EVENT = "placid_drip_delete_progress"
+
 
 @frappe.whitelist()
 def delete_documents(doctype, documents):
@@ -39,10 +52,14 @@ def delete_documents(doctype, documents):
 	check is stricter than the doctype-level permission would be: it is bounded to
 	their own batches, whereas a doctype-level delete right would apply to every
 	batch in the system.
+
+	Returns `{"queued": False, "total"}` once deleted inline, or, for more than
+	`BACKGROUND_THRESHOLD` documents, `{"queued": True, "job_id", "total", "event"}`
+	with progress published on `event`.
 	"""
 	documents = _as_list(documents)
 	if not documents:
-		return
+		return {"queued": False, "total": 0}
 
 	user = frappe.session.user
 
@@ -53,24 +70,99 @@ def delete_documents(doctype, documents):
 
 		_require_own_batch(doctype, documents, user)
 
-	for name in documents:
-		frappe.delete_doc(doctype, name, ignore_permissions=True)
+	if len(documents) <= BACKGROUND_THRESHOLD:
+		_delete(doctype, documents)
+		return {"queued": False, "total": len(documents)}
+
+	# Authorised above, in the request; the job only deletes.
+	job_id = f"delete_documents::{frappe.generate_hash(length=10)}"
+	frappe.enqueue(
+		"placid_drip.overrides.lms_api.delete_documents_job",
+		queue="long",
+		job_id=job_id,
+		enqueue_after_commit=True,
+		doctype=doctype,
+		documents=documents,
+		user=user,
+		tracking_id=job_id,
+	)
+	return {"queued": True, "job_id": job_id, "total": len(documents), "event": PROGRESS_EVENT}
+
+
+def delete_documents_job(doctype, documents, user, tracking_id):
+	"""Background half of `delete_documents`: chunked deletes with realtime progress.
+
+	Each chunk is its own transaction, so a failure part-way keeps what was
+	already deleted and reports what was not.
+	"""
+	done, failed = 0, []
+
+	for start in range(0, len(documents), DELETE_CHUNK):
+		chunk = documents[start : start + DELETE_CHUNK]
+		try:
+			_delete(doctype, chunk)
+			frappe.db.commit()
+			done += len(chunk)
+		except Exception:
+			frappe.db.rollback()
+			frappe.log_error(title="Bulk delete_documents chunk failed", message=frappe.get_traceback())
+			failed.extend(chunk)
+
+		frappe.publish_realtime(
+			PROGRESS_EVENT,
+			{
+				"job_id": tracking_id,
+				"doctype": doctype,
+				"done": done,
+				"failed": failed,
+				"total": len(documents),
+			},
+			user=user,
+		)
+
+
+def _delete(doctype, names):
+	if doctype != "LMS Batch Enrollment":
+		for name in names:
+			frappe.delete_doc(doctype, name, ignore_permissions=True)
+		return
+
+	# Removing a roster: each row's own on_trash would look up course enrollments
+	# for its member alone, so it is told to stand down and the course cleanup
+	# runs once per batch for every member removed from it.
+	rows = frappe.get_all(doctype, filters={"name": ["in", names]}, fields=["name", "batch", "member"])
+	for name in names:
+		frappe.delete_doc(doctype, name, ignore_permissions=True, flags={"roster_cleanup_deferred": True})
+
+	members_by_batch = {}
+	for row in rows:
+		members_by_batch.setdefault(row.batch, []).append(row.member)
+	for batch, members in members_by_batch.items():
+		remove_batch_course_enrollments(batch, members)
 
 
 def _require_own_batch(doctype, documents, user):
-	batches = set(get_facilitated_batch_names(user))
+	"""Every document belongs to a batch `user` facilitates - one query for all of them."""
+	batches = set(get_principal(user).facilitated_batches)
 	if not batches:
 		frappe.throw(_("Not permitted"), frappe.PermissionError)
 
 	batch_field = BATCH_FIELD_BY_DOCTYPE[doctype]
-
-	for name in documents:
-		batch = frappe.db.get_value(doctype, name, batch_field)
-		if not batch or batch not in batches:
-			frappe.throw(
-				_("You can only change batches you evaluate or instruct."),
-				frappe.PermissionError,
-			)
+	batch_by_name = dict(
+		frappe.get_all(
+			doctype,
+			filters={"name": ["in", documents]},
+			fields=["name", batch_field],
+			as_list=True,
+		)
+	)
+
+	# A name that does not exist has no batch, and fails closed like before.
+	if any(batch_by_name.get(name) not in batches for name in documents):
+		frappe.throw(
+			_("You can only change batches you evaluate or instruct."),
+			frappe.PermissionError,
+		)
 
 
 @frappe.whitelist()
@@ -90,6 +182,35 @@ def get_profile_details(username):
 	return details
 
 
+@frappe.whitelist()
+def update_chapter_index(**kwargs):
+	"""Upstream chapter reorder, then drop the course's rule-based schedules.
+
+	The reorder writes `Chapter Reference.idx` directly, so no doc event fires for
+	the outline positions that interval and after-previous rules are laid out by.
+	"""
+	result = lms_api.update_chapter_index(**kwargs)
+	_outline_reordered(
+		kwargs.get("course") or frappe.db.get_value("Course Chapter", kwargs.get("chapter"), "course")
+	)
+	return result
+
+
+@frappe.whitelist()
+def update_lesson_index(**kwargs):
+	"""Upstream lesson reorder, then drop the course's outline caches. See `update_chapter_index`."""
+	result = lms_api.update_lesson_index(**kwargs)
+	_outline_reordered(frappe.db.get_value("Course Lesson", kwargs.get("lesson"), "course"))
+	return result
+
+
+def _outline_reordered(course):
+	# Rule schedules and the quiz catalogue both follow the outline order.
+	if course:
+		schedule.clear_rule_schedules(course=course)
+		quiz_index.clear_course_quizzes([course])
+
+
 def _as_list(documents):
 	if isinstance(documents, str):
 		documents = frappe.parse_json(documents)
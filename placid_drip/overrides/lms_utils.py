@@ -1,11 +1,17 @@
 import frappe
 from frappe.rate_limiter import rate_limit
-from frappe.utils import now_datetime, get_datetime
-from placid_drip.access import resolve_user_batch_for_course, can_access_lesson
+from frappe.utils import now_datetime
+from placid_drip.access import (
+    can_access_lesson,
+    get_lesson_gate,
+    lesson_lock_state,
+    resolve_user_batch_for_course,
+)
 from lms.lms import utils as lms_utils
-from placid_drip import membership
+from placid_drip import membership, schedule
 from placid_drip.api import course_levels
 from placid_drip.constants import RATE_LIMIT, RATE_LIMIT_WINDOW
+from placid_drip.principal import DRAFT_VISIBLE_ROLES, get_principal
 
 LESSON_DTYPE = "Course Lesson"
 CHAPTER_DTYPE = "Course Chapter"
@@ -21,20 +27,11 @@ _FRAPPE_RPC_KEYS = {
 #     frappe.logger("placid_drip").warning(f"[drip-outline] {msg} {extra}".strip())
 
 def _should_enforce_drip() -> bool:
-    if frappe.session.user == "Guest":
-        return True
-
-    roles = set(frappe.get_roles(frappe.session.user))
-
-    # staff can always see everything
-    if roles & {"System Manager", "LMS Instructor"}:
-        return False
-
-    return "LMS Student" in roles
+    # staff can always see everything; resolved once per request
+    return get_principal().enforces_drip
 
 def _is_admin_or_moderator(user: str) -> bool:
-    roles = set(frappe.get_roles(user))
-    return user == "Administrator" or bool(roles & {"System Manager", "Moderator"})
+    return get_principal(user).is_staff
 
 def _is_evaluator_for_course(user: str, course: str) -> bool:
     """Evaluator on, or instructor of, this course - either bypasses the drip lock.
@@ -65,51 +62,6 @@ def _is_evaluator_for_course(user: str, course: str) -> bool:
     )
 
 
-
-def _resolve_lesson_docname(course: str, chapter_idx: int, lesson_idx: int) -> str | None:
-    chapter_name = frappe.db.get_value(
-        "Chapter Reference",
-        {"parent": course, "idx": int(chapter_idx)},
-        "chapter",
-    )
-    if not chapter_name:
-        return None
-
-    return frappe.db.get_value(
-        "Lesson Reference",
-        {"parent": chapter_name, "idx": int(lesson_idx)},
-        "lesson",
-    )
-
-
-def _is_locked_for_user(course: str, lesson_name: str) -> tuple[bool, str | None, str | None]:
-    """
-    Returns (locked, opens_at_str, reason)
-    Uses your existing resolve_user_batch_for_course().
-    """
-    batch = resolve_user_batch_for_course(frappe.session.user, course)
-    if not batch:
-        return True, None, "Not enrolled in a batch for this course."
-
-    row = frappe.db.get_value(
-        "Batch Lesson Access",
-        {"batch": batch, "lesson": lesson_name},
-        ["available_from", "force_lock"],
-        as_dict=True,
-    )
-
-    if not row:
-        return False, None, None
-
-    if row.get("force_lock"):
-        return True, None, "Locked by cohort schedule"
-
-    opens = get_datetime(row.get("available_from"))
-    if opens and now_datetime() < opens:
-        return True, str(opens), f"Opens on {opens}"
-
-    return False, None, None
-
 @frappe.whitelist()
 @rate_limit(limit=RATE_LIMIT, seconds=RATE_LIMIT_WINDOW)
 def get_lesson(*args, **kwargs):
@@ -118,19 +70,24 @@ def get_lesson(*args, **kwargs):
     course = clean_kwargs.get("course") or clean_kwargs.get("course_name")
     chapter = clean_kwargs.get("chapter")
     lesson = clean_kwargs.get("lesson")
-    is_eval = _is_evaluator_for_course(frappe.session.user, course) if course else False
+
+    # One statement resolves the lesson and the evaluator/instructor bypass;
+    # batch and lock row are cache reads inside lesson_lock_state.
+    gate = None
+    if frappe.session.user != "Guest" and course and chapter and lesson:
+        gate = get_lesson_gate(frappe.session.user, course, int(chapter), int(lesson))
+    is_eval = bool(gate and gate.bypass)
 
 
     if (
-        frappe.session.user != "Guest"
-        and course and chapter and lesson
+        gate
         and not is_eval
         and not _is_admin_or_moderator(frappe.session.user)
         and _should_enforce_drip()
     ):
-        lesson_name = _resolve_lesson_docname(course, int(chapter), int(lesson))
+        lesson_name = gate.lesson
         if lesson_name:
-            locked, opens_at, reason = _is_locked_for_user(course, lesson_name)
+            locked, opens_at, reason = lesson_lock_state(frappe.session.user, course, lesson_name)
             if locked:
                 # Return a "locked" payload; frontend already understands no_preview
                 return {
@@ -152,9 +109,9 @@ def get_lesson(*args, **kwargs):
         and lesson
         and is_eval
     ):
-        # ✅ Resolve the SAME way LMS does
-        chapter_name = frappe.db.get_value("Chapter Reference", {"parent": course, "idx": int(chapter)}, "chapter")
-        lesson_name = frappe.db.get_value("Lesson Reference", {"parent": chapter_name, "idx": int(lesson)}, "lesson")
+        # ✅ Resolved the SAME way LMS does, by the gate above
+        chapter_name = gate.chapter
+        lesson_name = gate.lesson
         if not lesson_name:
             return {}
 
@@ -263,59 +220,20 @@ def get_course_outline(*args, **kwargs):
         # _log("lock-all policy applied", chapters=len(outline))
         return outline
 
-    # 8) collect lesson names
-    lesson_names = [
-        l["name"]
-        for ch in outline
-        for l in ch.get("lessons", [])
-        if l.get("name")
-    ]
-    # _log("lesson_names collected", count=len(lesson_names))
-
-    if not lesson_names:
-        # _log("no lessons found -> returning outline unchanged")
-        return outline
-
-    # 9) fetch schedule rows
-    rows = frappe.db.get_all(
-        "Batch Lesson Access",
-        filters={"batch": batch, "lesson": ["in", lesson_names]},
-        fields=["lesson", "available_from", "force_lock"],
-    )
-    # _log("schedule rows fetched", rows_count=len(rows))
+    # 8) compiled lock table for this batch+course (redis, rebuilt only on writes)
+    table = schedule.get_lock_table(batch, course)
+    # _log("lock table fetched", lessons=len(table.lessons))
 
-    by_lesson = {r["lesson"]: r for r in rows}
     now = now_datetime()
     # _log("now", now=str(now))
-    # 10) annotate outline
-    locked_count = 0
-    for ch in outline:
-        for lesson in ch.get("lessons", []):
-            lname = lesson.get("name")
-            r = by_lesson.get(lname)
-
-            # defaults
-            lesson["is_locked"] = 0
-            lesson["opens_at"] = None
-            lesson["lock_reason"] = None
-
-            if not r:
-                continue
-
-            if r.get("force_lock"):
-                lesson["is_locked"] = 1
-                lesson["lock_reason"] = "Locked by cohort schedule"
-                locked_count += 1
-                continue
-
-            opens = get_datetime(r.get("available_from"))
-            if opens and now < opens:
-                lesson["is_locked"] = 1
-                lesson["opens_at"] = str(opens)  # stringify so JSON is clean
-                lesson["lock_reason"] = f"Opens on {opens}"
-                locked_count += 1
-
-    # _log("annotation complete", locked_count=locked_count)
+    # 9) annotate outline: one integer comparison per lesson, reasons only for locked ones
+    #    ("after previous lesson" slots are resolved against this user's progress)
+    table.annotate(
+        (lesson for ch in outline for lesson in ch.get("lessons", [])),
+        now,
+        frappe.session.user,
+        course,
+    )
 
     # IMPORTANT: return outline (list) so API response becomes {"message": [ ... ]}
     return outline
@@ -338,22 +256,9 @@ def get_courses(filters=None, start=0):
     return _attach_levels(courses)
 
 
-#: Roles that may see unpublished courses in the catalogue. Course Creator is in
-#: here because authors need to find their own drafts; Batch Evaluator is
-#: deliberately not, because a facilitator runs batches rather than writing
-#: courses. Kept separate from `_is_admin_or_moderator` above, which answers a
-#: different question (who bypasses the drip lock) for different callers.
-DRAFT_VISIBLE_ROLES = {"System Manager", "Moderator", "Course Creator"}
-
-
 def _can_see_drafts(user: str) -> bool:
-    if user == "Guest":
-        return False
-
-    if user == "Administrator":
-        return True
-
-    return bool(set(frappe.get_roles(user)) & DRAFT_VISIBLE_ROLES)
+    # DRAFT_VISIBLE_ROLES, via the request's principal.
+    return get_principal(user).sees_drafts
 
 
 def _restrict_to_published(filters):
@@ -460,7 +365,7 @@ def _can_edit_batch(batch, details) -> bool:
     if _is_admin_or_moderator(user):
         return True
 
-    if "Batch Evaluator" not in frappe.get_roles(user):
+    if "Batch Evaluator" not in get_principal(user).roles:
         return False
 
     if frappe.db.get_value("LMS Batch", batch, "owner") == user:
@@ -0,0 +1,38 @@
+"""Add `LMS Enrollment.completed_lessons` and fill it from existing progress.
+
+A Custom Field for the same reason as `add_organization_and_level_fields`: LMS
+Enrollment belongs to the lms app, and a field in its JSON would not survive the
+next upstream pull. From here on `placid_drip.progress` keeps the count current;
+this fills it once for the enrollments that already exist.
+
+Idempotent - `create_custom_fields` updates in place and `reconcile_all`
+recomputes rather than adds.
+"""
+
+import frappe
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
+
+from placid_drip.progress import reconcile_all
+
+CUSTOM_FIELDS = {
+	"LMS Enrollment": [
+		{
+			"fieldname": "completed_lessons",
+			"label": "Completed Lessons",
+			"fieldtype": "Int",
+			"default": "0",
+			"read_only": 1,
+			"insert_after": "progress",
+			"description": "Maintained from LMS Course Progress. Progress is derived from this and the course's lesson count.",
+		}
+	],
+}
+
+
+def execute():
+	create_custom_fields(CUSTOM_FIELDS)
+	frappe.db.commit()
+
+	reconcile_all()
+
+	print("add_enrollment_completed_lessons: LMS Enrollment.completed_lessons ready")
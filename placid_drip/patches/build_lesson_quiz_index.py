@@ -0,0 +1,11 @@
+"""Build `Lesson Quiz Index` for the lessons that existed before it did.
+
+From here on the index is kept current by `Course Lesson` saves. `rebuild`
+rewrites the table from scratch, so this is safe to re-run.
+"""
+
+from placid_drip.quiz_index import rebuild
+
+
+def execute():
+	rebuild()
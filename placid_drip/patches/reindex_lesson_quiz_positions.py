@@ -0,0 +1,11 @@
+"""Fill `Lesson Quiz Index.position` for rows indexed before it existed.
+
+Without it the course quiz catalogue cannot keep embedded quizzes in the order
+the lesson shows them. `rebuild` rewrites every row, so this is safe to re-run.
+"""
+
+from placid_drip.quiz_index import rebuild
+
+
+def execute():
+	rebuild()
@@ -0,0 +1,40 @@
+"""A drip schedule for a batch's course expressed as a rule rather than as rows.
+
+"One chapter a week from the start" needs no `Batch Lesson Access` row per
+lesson: `placid_drip.schedule` derives each lesson's opening from the batch
+start and the lesson's position in the outline when it compiles the schedule,
+so the table no longer grows by batches x lessons for the common case. Rows
+that do exist still win for their lesson, which is how a single lesson is held
+back or let out early under a rule.
+"""
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+
+from placid_drip import schedule
+from placid_drip.facilitator import can_manage_batch_course
+
+
+class BatchDripRule(Document):
+	def autoname(self):
+		# One rule per (batch, course), the same shape as a lesson row's key.
+		self.name = f"{self.batch}::{self.course}"
+
+	def validate(self):
+		if not frappe.db.exists(
+			"Batch Course", {"parenttype": "LMS Batch", "parent": self.batch, "course": self.course}
+		):
+			frappe.throw(_("{0} is not a course of {1}.").format(self.course, self.batch))
+
+		if not can_manage_batch_course(frappe.session.user, self.batch, self.course):
+			frappe.throw(
+				_("You can only set rules for batches/courses you evaluate or instruct."),
+				frappe.PermissionError,
+			)
+
+	def on_update(self):
+		schedule.clear_schedule(self.batch, self.course)
+
+	def on_trash(self):
+		schedule.clear_schedule(self.batch, self.course)
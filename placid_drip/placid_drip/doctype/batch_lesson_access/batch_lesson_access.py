@@ -1,6 +1,7 @@
 import frappe
 from frappe.model.document import Document
 
+from placid_drip import schedule
 from placid_drip.facilitator import can_manage_batch_course
 
 class BatchLessonAccess(Document):
@@ -11,6 +12,29 @@ class BatchLessonAccess(Document):
     def validate(self):
         self._enforce_unique_lock()
         self._enforce_evaluator_scope()
+        self._detach_hand_edit()
+
+    def _detach_hand_edit(self):
+        # A date changed by hand is no longer the template's to recompute.
+        if self.schedule_template and not self.is_new() and (
+            self.has_value_changed("available_from") or self.has_value_changed("force_lock")
+        ):
+            self.schedule_template = None
+
+    def on_update(self):
+        self._clear_compiled_schedule()
+
+    def on_trash(self):
+        self._clear_compiled_schedule()
+
+    def _clear_compiled_schedule(self):
+        # A row moved to another batch/course leaves a stale entry behind in the
+        # schedule it came from, so that one is dropped as well.
+        schedule.clear_schedule(self.batch, self.course)
+
+        before = self.get_doc_before_save()
+        if before and (before.batch, before.course) != (self.batch, self.course):
+            schedule.clear_schedule(before.batch, before.course)
 
     def _enforce_unique_lock(self):
         # uniqueness must match your autoname dimensions
@@ -0,0 +1,81 @@
+"""A course's drip schedule written relative to a batch's start.
+
+See `placid_drip.schedule_templates` for how it becomes `Batch Lesson Access`
+rows, and why those rows stay absolute.
+"""
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+
+from placid_drip import schedule_templates
+
+
+class DripScheduleTemplate(Document):
+	def validate(self):
+		self.validate_lessons()
+		self.validate_batch_scope()
+
+	def validate_lessons(self):
+		"""One row per lesson, every lesson from this course, no negative offsets."""
+		seen = set()
+		for row in self.lessons:
+			if row.lesson in seen:
+				frappe.throw(_("Row {0}: {1} is listed twice.").format(row.idx, frappe.bold(row.lesson)))
+			seen.add(row.lesson)
+
+			if (row.offset_days or 0) < 0:
+				frappe.throw(_("Row {0}: the offset cannot be negative.").format(row.idx))
+
+		if not seen:
+			return
+
+		in_course = set(
+			frappe.get_all(
+				"Course Lesson",
+				filters={"name": ["in", list(seen)], "course": self.course},
+				pluck="name",
+			)
+		)
+		foreign = [lesson for lesson in seen if lesson not in in_course]
+		if foreign:
+			frappe.throw(_("Not lessons of {0}: {1}").format(frappe.bold(self.course), ", ".join(foreign)))
+
+	def validate_batch_scope(self):
+		"""Editing or deleting a template rewrites every batch using it.
+
+		`recompute_template` writes those rows directly, past the per-row check in
+		`Batch Lesson Access`, so the same bar is applied here up front: the user
+		must be able to manage the course in every one of those batches.
+		"""
+		if self.is_new():
+			return
+
+		batches = schedule_templates.get_template_batches(self.name)
+		if not batches:
+			return
+
+		# `course` is set only once, so the batches' rows are all for this course.
+		schedule_templates.assert_can_apply(self.course, batches, frappe.session.user)
+
+	def on_update(self):
+		# Batches already on this template follow the edit; hand-edited lessons in
+		# them are left as they are.
+		schedule_templates.recompute_template(self)
+
+	def on_trash(self):
+		"""Detach rather than delete: the batches keep the dates they were given.
+
+		Runs before Frappe's link check, which would otherwise refuse the delete
+		for as long as any row still points here.
+		"""
+		self.validate_batch_scope()
+
+		frappe.db.sql(
+			"""
+			UPDATE `tabBatch Lesson Access`
+			SET schedule_template = NULL
+			WHERE schedule_template = %s
+			""",
+			(self.name,),
+		)
@@ -0,0 +1,8 @@
+"""One row per (lesson, quiz): where each quiz lives. See `placid_drip.quiz_index`."""
+
+from frappe.model.document import Document
+
+
+class LessonQuizIndex(Document):
+	def autoname(self):
+		self.name = f"{self.lesson}::{self.quiz}"
@@ -13,6 +13,8 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import get_url
 
+from placid_drip.invites import pending_email_changed
+
 
 class StudentInvite(Document):
 	def before_insert(self):
@@ -26,6 +28,19 @@ class StudentInvite(Document):
 		self.email = (self.email or "").strip().lower()
 		self.validate_batches()
 
+	def on_update(self):
+		# Keeps `User.after_insert` from querying for invites that cannot exist.
+		if not (self.has_value_changed("status") or self.has_value_changed("email")):
+			return
+
+		before = self.get_doc_before_save()
+		if before and before.email != self.email:
+			pending_email_changed(before.email, False)
+		pending_email_changed(self.email, self.status == "Pending")
+
+	def on_trash(self):
+		pending_email_changed(self.email, False)
+
 	def validate_batches(self):
 		"""Reject duplicate rows so an invite cannot enrol someone twice."""
 		seen = set()
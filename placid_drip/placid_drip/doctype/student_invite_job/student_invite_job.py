@@ -0,0 +1,7 @@
+"""Progress of one background invite run. See `placid_drip.invites.start_invite_job`."""
+
+from frappe.model.document import Document
+
+
+class StudentInviteJob(Document):
+	pass
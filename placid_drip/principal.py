@@ -0,0 +1,98 @@
+"""Who the caller is, worked out once per request.
+
+Every permission helper in the app used to re-derive the caller's roles on its
+own - `is_staff`, the drip bypass, draft visibility, the level counts, the quiz
+report gates - and one of them did it with three raw `Has Role` queries. A
+single outline or lesson load could ask the same question four or five times.
+`get_principal` answers all of them from one object that lives for the request
+(`frappe.local.request_cache`), so the roles are read once and everything
+derived from them is computed at most once.
+
+The more expensive facts - which batches the user facilitates, which courses
+they instruct or evaluate - are lazy: most requests never need them, and a
+principal should not cost a query just for existing.
+"""
+
+from functools import cached_property
+
+import frappe
+from frappe.utils.caching import request_cache
+
+STAFF_ROLES = frozenset({"System Manager", "Moderator"})
+
+#: Roles that may see unpublished courses in the catalogue. Course Creator is in
+#: here because authors need to find their own drafts; Batch Evaluator is
+#: deliberately not, because a facilitator runs batches rather than writing
+#: courses. Kept separate from `is_staff`, which answers a different question
+#: (who bypasses the drip lock) for different callers.
+DRAFT_VISIBLE_ROLES = frozenset({"System Manager", "Moderator", "Course Creator"})
+
+#: Roles whose drip lock is never enforced, whatever else they hold.
+DRIP_EXEMPT_ROLES = frozenset({"System Manager", "LMS Instructor"})
+
+
+class Principal:
+	def __init__(self, user: str):
+		self.user = user
+
+	@property
+	def is_guest(self) -> bool:
+		return self.user == "Guest"
+
+	@property
+	def is_administrator(self) -> bool:
+		return self.user == "Administrator"
+
+	@cached_property
+	def roles(self) -> frozenset[str]:
+		return frozenset(frappe.get_roles(self.user))
+
+	def has_any_role(self, roles) -> bool:
+		return bool(self.roles & set(roles))
+
+	@cached_property
+	def is_staff(self) -> bool:
+		"""Administrator, System Manager or Moderator - the site-wide bypass."""
+		return self.is_administrator or self.has_any_role(STAFF_ROLES)
+
+	@cached_property
+	def enforces_drip(self) -> bool:
+		"""Guests and plain students are drip-locked; staff never are."""
+		if self.is_guest:
+			return True
+
+		if self.has_any_role(DRIP_EXEMPT_ROLES):
+			return False
+
+		return "LMS Student" in self.roles
+
+	@cached_property
+	def sees_drafts(self) -> bool:
+		if self.is_guest:
+			return False
+
+		return self.is_administrator or self.has_any_role(DRAFT_VISIBLE_ROLES)
+
+	@cached_property
+	def facilitated_batches(self) -> list[str]:
+		# Imported here: `facilitator` itself asks the principal whether the user
+		# is staff, so a module-level import would be circular.
+		from placid_drip.facilitator import get_facilitated_batch_names
+
+		return get_facilitated_batch_names(self.user)
+
+	@cached_property
+	def instructed_courses(self) -> frozenset[str]:
+		from placid_drip.facilitator import get_instructed_course_names
+
+		return frozenset(get_instructed_course_names(self.user))
+
+
+def get_principal(user: str | None = None) -> Principal:
+	"""The request-scoped principal for `user`, defaulting to the session user."""
+	return _get_principal(user or frappe.session.user)
+
+
+@request_cache
+def _get_principal(user: str) -> Principal:
+	return Principal(user)
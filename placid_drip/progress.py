@@ -0,0 +1,135 @@
+"""Enrollment progress kept as a running count instead of a recount.
+
+`LMS Enrollment.progress` used to be recomputed on every completed lesson by
+counting the course's lessons and every completed `LMS Course Progress` row the
+member had - two counts that grow with the course for what is one more lesson
+done. Now each enrollment carries `completed_lessons` (a Custom Field added by
+`patches.add_enrollment_completed_lessons`), a progress row moving into or out
+of Complete nudges it by one, and `progress` is derived from it and the
+course's lesson total in the same UPDATE.
+
+The lesson total is cached per course and dropped when a lesson is added to or
+removed from the course. That is also the one event that changes every
+enrollment's percentage at once, so it enqueues `reconcile_course`, which
+recomputes a whole course's enrollments in one grouped UPDATE. Run it for every
+course with
+
+	bench --site <site> execute placid_drip.progress.reconcile_all
+"""
+
+import frappe
+
+LESSON_TOTALS_KEY = "placid_drip:course_lesson_totals"
+
+COMPLETE = "Complete"
+
+
+def get_lesson_total(course: str) -> int:
+	return frappe.cache().hget(
+		LESSON_TOTALS_KEY,
+		course,
+		generator=lambda: frappe.db.count("Course Lesson", {"course": course}),
+	)
+
+
+def clear_lesson_totals(courses) -> None:
+	courses = [c for c in set(courses or []) if c]
+	if not courses:
+		return
+
+	frappe.cache().hdel(LESSON_TOTALS_KEY, courses)
+	frappe.db.after_commit.add(lambda: frappe.cache().hdel(LESSON_TOTALS_KEY, courses))
+
+
+def bump_completed(member: str, course: str, delta: int) -> None:
+	"""Move `member`'s completed count in `course` by `delta`, and progress with it.
+
+	One UPDATE, evaluated left to right, so `progress` reads the new count and
+	concurrent completions cannot lose an increment.
+	"""
+	total = get_lesson_total(course)
+
+	frappe.db.sql(
+		"""
+		UPDATE `tabLMS Enrollment`
+		SET completed_lessons = GREATEST(IFNULL(completed_lessons, 0) + %(delta)s, 0),
+			progress = IF(%(total)s > 0, LEAST(FLOOR(completed_lessons * 100 / %(total)s), 100), progress)
+		WHERE member = %(member)s AND course = %(course)s
+		""",
+		{"member": member, "course": course, "delta": delta, "total": total},
+	)
+
+
+def reconcile_course(course: str) -> None:
+	"""Recompute `completed_lessons` and `progress` for every enrollment in `course`."""
+	total = get_lesson_total(course)
+
+	frappe.db.sql(
+		"""
+		UPDATE `tabLMS Enrollment` e
+		LEFT JOIN (
+			SELECT member, COUNT(DISTINCT lesson) AS done
+			FROM `tabLMS Course Progress`
+			WHERE course = %(course)s AND status = %(complete)s
+			GROUP BY member
+		) p ON p.member = e.member
+		SET e.completed_lessons = IFNULL(p.done, 0),
+			e.progress = IF(%(total)s > 0, LEAST(FLOOR(IFNULL(p.done, 0) * 100 / %(total)s), 100), e.progress)
+		WHERE e.course = %(course)s
+		""",
+		{"course": course, "complete": COMPLETE, "total": total},
+	)
+
+
+def reconcile_all() -> None:
+	for course in frappe.get_all("LMS Enrollment", pluck="course", distinct=True):
+		if course:
+			reconcile_course(course)
+	frappe.db.commit()
+
+
+def on_progress_update(doc, method=None):
+	"""`LMS Course Progress` on_update: count a lesson moving into or out of Complete.
+
+	Also fires on insert, where there is no before-save doc and so nothing was
+	complete before.
+	"""
+	before = doc.get_doc_before_save()
+	was = bool(before and before.status == COMPLETE)
+	delta = int(doc.status == COMPLETE) - int(was)
+
+	if delta and doc.member and doc.course:
+		bump_completed(doc.member, doc.course, delta)
+
+
+def on_progress_trash(doc, method=None):
+	if doc.status == COMPLETE and doc.member and doc.course:
+		bump_completed(doc.member, doc.course, -1)
+
+
+def on_lesson_update(doc, method=None):
+	"""`Course Lesson` on_update: a new lesson, or one moved between courses."""
+	before = doc.get_doc_before_save()
+	if before and before.course == doc.course:
+		return
+
+	_lesson_count_changed([doc.course, before.course if before else None])
+
+
+def on_lesson_trash(doc, method=None):
+	_lesson_count_changed([doc.course])
+
+
+def _lesson_count_changed(courses) -> None:
+	courses = [c for c in set(courses) if c]
+	clear_lesson_totals(courses)
+
+	for course in courses:
+		frappe.enqueue(
+			"placid_drip.progress.reconcile_course",
+			queue="default",
+			job_id=f"progress_reconcile::{course}",
+			deduplicate=True,
+			enqueue_after_commit=True,
+			course=course,
+		)
@@ -0,0 +1,294 @@
+"""Batch-wide quiz reports, computed in the database and cached per batch.
+
+The reports page used to fetch raw submissions quiz by quiz and pivot them in
+the browser - sixty requests for a sixty-quiz batch, each reading every row.
+Here each report is built from grouped queries, reshaped in Python and
+kept in redis per batch.
+
+A cached report is dropped whenever something it reads changes: a submission by
+any member of the batch, the roster, the batch's courses, or the quizzes those
+courses hold. Dropping is cheap
+and the next facilitator to open the page rebuilds it, so a flurry of exam
+submissions costs one rebuild, not one per submission.
+"""
+
+from array import array
+
+import frappe
+
+from placid_drip import quiz_index
+
+GRADEBOOK_KEY = "placid_drip:batch_gradebook"
+STATISTICS_KEY = "placid_drip:batch_quiz_statistics"
+
+#: Every per-batch report hash, so one eviction clears them all.
+REPORT_KEYS = (GRADEBOOK_KEY, STATISTICS_KEY)
+
+#: Percentiles reported for each quiz's score distribution.
+PERCENTILES = (10, 25, 50, 75, 90)
+
+#: Cell value for a student with no submission to a quiz. Never a real score.
+MISSING = float("nan")
+
+
+def get_gradebook(batch: str) -> dict:
+	"""Students x quizzes for `batch`, as dense row-major matrices.
+
+	`students` and `quizzes` give the row and column order; `best_score`,
+	`latest_score`, `best_percentage`, `latest_percentage` and `attempts` are
+	one list per student with one cell per quiz. A quiz the student never
+	attempted is `None` (and 0 attempts).
+	"""
+	return frappe.cache().hget(GRADEBOOK_KEY, batch, generator=lambda: _build_gradebook(batch))
+
+
+def _build_gradebook(batch: str) -> dict:
+	students = frappe.db.sql(
+		"""
+		SELECT e.member, IFNULL(u.full_name, e.member) AS member_name
+		FROM `tabLMS Batch Enrollment` e
+		LEFT JOIN `tabUser` u ON u.name = e.member
+		WHERE e.batch = %s
+		ORDER BY member_name ASC, e.member ASC
+		""",
+		(batch,),
+		as_dict=True,
+	)
+	quizzes = get_batch_quizzes(batch)
+
+	rows, cols = len(students), len(quizzes)
+	matrices = {
+		"best_score": array("d", [MISSING]) * (rows * cols),
+		"latest_score": array("d", [MISSING]) * (rows * cols),
+		"best_percentage": array("d", [MISSING]) * (rows * cols),
+		"latest_percentage": array("d", [MISSING]) * (rows * cols),
+	}
+	attempts = array("l", [0]) * (rows * cols)
+
+	if rows and cols:
+		row_of = {s.member: i for i, s in enumerate(students)}
+		col_of = {q["quiz"]: j for j, q in enumerate(quizzes)}
+
+		# Latest = the newest attempt's value, picked inside the group so the
+		# whole matrix is still one statement.
+		cells = frappe.db.sql(
+			"""
+			SELECT
+				s.member,
+				s.quiz,
+				COUNT(*) AS attempts,
+				MAX(s.score) AS best_score,
+				MAX(s.percentage) AS best_percentage,
+				SUBSTRING_INDEX(GROUP_CONCAT(s.score ORDER BY s.creation DESC, s.name DESC), ',', 1) AS latest_score,
+				SUBSTRING_INDEX(GROUP_CONCAT(s.percentage ORDER BY s.creation DESC, s.name DESC), ',', 1) AS latest_percentage
+			FROM `tabLMS Quiz Submission` s
+			WHERE s.quiz IN %(quizzes)s
+			  AND s.member IN (SELECT member FROM `tabLMS Batch Enrollment` WHERE batch = %(batch)s)
+			GROUP BY s.member, s.quiz
+			""",
+			{"batch": batch, "quizzes": tuple(col_of)},
+		)
+
+		for member, quiz, count, best, best_pct, latest, latest_pct in cells:
+			i = row_of.get(member)
+			if i is None:
+				continue
+			k = i * cols + col_of[quiz]
+			attempts[k] = count
+			matrices["best_score"][k] = _num(best)
+			matrices["best_percentage"][k] = _num(best_pct)
+			matrices["latest_score"][k] = _num(latest)
+			matrices["latest_percentage"][k] = _num(latest_pct)
+
+	gradebook = {
+		"batch": batch,
+		"students": [dict(s) for s in students],
+		"quizzes": quizzes,
+		"attempts": [attempts[i * cols : (i + 1) * cols].tolist() for i in range(rows)],
+	}
+	for name, values in matrices.items():
+		# NaN is not JSON; the slice-per-row is also where it becomes None.
+		gradebook[name] = [
+			[None if v != v else v for v in values[i * cols : (i + 1) * cols]] for i in range(rows)
+		]
+
+	return gradebook
+
+
+def get_quiz_statistics(batch: str) -> dict[str, dict]:
+	"""quiz -> distribution, pass rate and per-question correctness for `batch`.
+
+	The distribution is over each student's best percentage, so a student who
+	retook a quiz five times counts once. Per-question correctness is over every
+	attempt, since every attempt answered the questions.
+	"""
+	return frappe.cache().hget(STATISTICS_KEY, batch, generator=lambda: _build_statistics(batch))
+
+
+def _build_statistics(batch: str) -> dict[str, dict]:
+	quizzes = get_batch_quizzes(batch)
+	if not quizzes:
+		return {}
+
+	params = {"batch": batch, "quizzes": tuple(q["quiz"] for q in quizzes)}
+
+	# One row per (quiz, whole percentage point): enough to read any percentile
+	# to the point, with the exact sum alongside for the mean.
+	histogram = frappe.db.sql(
+		"""
+		SELECT
+			b.quiz,
+			LEAST(GREATEST(FLOOR(b.best), 0), 100) AS bucket,
+			COUNT(*) AS students,
+			SUM(b.best) AS total,
+			SUM(b.best >= IFNULL(q.passing_percentage, 0)) AS passed
+		FROM (
+			SELECT s.quiz, s.member, MAX(IFNULL(s.percentage, 0)) AS best
+			FROM `tabLMS Quiz Submission` s
+			WHERE s.quiz IN %(quizzes)s
+			  AND s.member IN (SELECT member FROM `tabLMS Batch Enrollment` WHERE batch = %(batch)s)
+			GROUP BY s.quiz, s.member
+		) b
+		JOIN `tabLMS Quiz` q ON q.name = b.quiz
+		GROUP BY b.quiz, bucket
+		""",
+		params,
+	)
+
+	questions = frappe.db.sql(
+		"""
+		SELECT
+			s.quiz,
+			r.question,
+			COUNT(*) AS answered,
+			SUM(IFNULL(r.is_correct, 0)) AS correct
+		FROM `tabLMS Quiz Result` r
+		JOIN `tabLMS Quiz Submission` s ON s.name = r.parent AND r.parenttype = 'LMS Quiz Submission'
+		WHERE s.quiz IN %(quizzes)s
+		  AND s.member IN (SELECT member FROM `tabLMS Batch Enrollment` WHERE batch = %(batch)s)
+		GROUP BY s.quiz, r.question
+		ORDER BY s.quiz, MIN(r.idx)
+		""",
+		params,
+	)
+
+	buckets = _collect_buckets(histogram)
+
+	by_question = {}
+	for quiz, question, answered, correct in questions:
+		by_question.setdefault(quiz, []).append(
+			{
+				"question": question,
+				"answered": answered,
+				"correct": int(correct or 0),
+				"correct_rate": round(int(correct or 0) / answered, 4) if answered else None,
+			}
+		)
+
+	statistics = {}
+	for q in quizzes:
+		entry = buckets.get(q["quiz"])
+		students = entry["students"] if entry else 0
+		statistics[q["quiz"]] = {
+			"quiz": q["quiz"],
+			"title": q["title"],
+			"students": students,
+			"mean": round(entry["total"] / students, 2) if students else None,
+			"median": _percentile(entry["counts"], students, 50) if students else None,
+			"percentiles": {
+				str(p): _percentile(entry["counts"], students, p) if students else None for p in PERCENTILES
+			},
+			"histogram": entry["counts"] if entry else [0] * 101,
+			"pass_rate": round(entry["passed"] / students, 4) if students else None,
+			"questions": by_question.get(q["quiz"], []),
+		}
+
+	return statistics
+
+
+def _collect_buckets(histogram) -> dict[str, dict]:
+	"""quiz -> per-point `counts`, `students`, summed `total` and `passed`, from the histogram rows."""
+	buckets = {}
+	for quiz, bucket, students, total, passed in histogram:
+		entry = buckets.setdefault(quiz, {"counts": [0] * 101, "students": 0, "total": 0.0, "passed": 0})
+		entry["counts"][int(bucket)] += students
+		entry["students"] += students
+		entry["total"] += float(total or 0)
+		entry["passed"] += int(passed or 0)
+	return buckets
+
+
+def _percentile(counts: list[int], total: int, p: int) -> int:
+	"""Nearest-rank percentile, read off a per-point histogram."""
+	rank = max(1, -(-p * total // 100))
+	seen = 0
+	for point, count in enumerate(counts):
+		seen += count
+		if seen >= rank:
+			return point
+	return len(counts) - 1
+
+
+def get_batch_quizzes(batch: str) -> list[dict]:
+	"""`{quiz, title}` for every quiz in the batch's courses, in course order, once each."""
+	courses = frappe.get_all(
+		"Batch Course",
+		filters={"parenttype": "LMS Batch", "parent": batch},
+		pluck="course",
+		order_by="idx asc",
+	)
+
+	quizzes = {}
+	for course in courses:
+		for row in quiz_index.get_course_quizzes(course):
+			quizzes.setdefault(row["quiz"], row["quiz_title"])
+
+	return [{"quiz": quiz, "title": title} for quiz, title in quizzes.items()]
+
+
+def clear_batch_reports(batches) -> None:
+	batches = [b for b in set(batches or []) if b]
+	if not batches:
+		return
+
+	def _drop():
+		for key in REPORT_KEYS:
+			frappe.cache().hdel(key, batches)
+
+	_drop()
+	frappe.db.after_commit.add(_drop)
+
+
+def clear_course_reports(courses) -> None:
+	"""Drop the reports of every batch running one of `courses`.
+
+	For changes to a course's quiz catalogue - a quiz added, removed or renamed -
+	which decide the reports' columns and titles.
+	"""
+	courses = [c for c in set(courses or []) if c]
+	if not courses:
+		return
+
+	clear_batch_reports(
+		frappe.get_all(
+			"Batch Course",
+			filters={"parenttype": "LMS Batch", "course": ["in", courses]},
+			pluck="parent",
+			distinct=True,
+		)
+	)
+
+
+def on_submission_change(doc, method=None):
+	"""`LMS Quiz Submission` after_insert / on_update / on_trash."""
+	if doc.member:
+		clear_batch_reports(
+			frappe.get_all("LMS Batch Enrollment", filters={"member": doc.member}, pluck="batch")
+		)
+
+
+def _num(value) -> float:
+	try:
+		return float(value)
+	except (TypeError, ValueError):
+		return MISSING
@@ -0,0 +1,234 @@
+"""Which lesson a quiz belongs to, kept as a table instead of re-derived.
+
+A quiz reaches a lesson two ways: the lesson's `quiz_id` field, or a quiz block
+embedded in its EditorJS `content`. Finding the lesson from the quiz used to mean
+loading lesson bodies and parsing each one - on every quiz submission, and across
+the whole site when the quiz had no course. `Lesson Quiz Index` records the
+answer when the lesson is saved, which is the only time it can change, so the
+submission path is one indexed lookup.
+
+The same table answers the other direction - which quizzes a course has - for
+the facilitator's quiz pickers. `get_course_quizzes` serves that from redis,
+built from the index in one query and dropped whenever a lesson or quiz feeding
+it changes, so both reports list the same quizzes, embedded ones included.
+
+`rebuild` rewrites the table from scratch; it runs once from the patch that
+introduces it and can be re-run any time with
+
+	bench --site <site> execute placid_drip.quiz_index.rebuild
+"""
+
+import json
+
+import frappe
+from frappe.utils import now_datetime
+
+from placid_drip import quiz_analytics
+
+INDEX_DOCTYPE = "Lesson Quiz Index"
+CATALOGUE_KEY = "placid_drip:course_quizzes"
+
+#: Keys a quiz block has used for the quiz name across LMS versions.
+BLOCK_QUIZ_KEYS = ("quiz", "quiz_id", "id")
+
+#: Lessons read per query by `rebuild`, so their bodies are never all in memory.
+REBUILD_CHUNK = 500
+
+
+def extract_quizzes(quiz_id: str | None, content: str | None) -> list[tuple[str, str]]:
+	"""(quiz, source) pairs for one lesson, `quiz_id` first, each quiz once.
+
+	The rest follow the body's block order, which `_insert` keeps as `position`.
+	"""
+	found = {}
+	if quiz_id:
+		found[quiz_id] = "quiz_id"
+
+	if content:
+		try:
+			blocks = json.loads(content).get("blocks") or []
+		except Exception:
+			# ignore bad JSON, as every reader of lesson content does
+			blocks = []
+
+		for block in blocks:
+			if not isinstance(block, dict) or block.get("type") != "quiz":
+				continue
+			data = block.get("data") or {}
+			quiz = next((data[k] for k in BLOCK_QUIZ_KEYS if data.get(k)), None)
+			if quiz:
+				found.setdefault(quiz, "content")
+
+	return list(found.items())
+
+
+def get_lesson_for_quiz(quiz: str, course: str | None = None) -> dict | None:
+	"""`{"name", "course"}` of the lesson holding `quiz`, preferring `course`.
+
+	A quiz used in several lessons resolves to the earliest-indexed one, which is
+	as deterministic as the old scan ever was.
+	"""
+	filters = {"quiz": quiz}
+	if course:
+		filters["course"] = course
+
+	row = frappe.db.get_value(
+		INDEX_DOCTYPE, filters, ["lesson", "course"], as_dict=True, order_by="creation asc"
+	)
+	if not row and course:
+		# `LMS Quiz.course` can disagree with where the quiz is actually used.
+		row = frappe.db.get_value(
+			INDEX_DOCTYPE, {"quiz": quiz}, ["lesson", "course"], as_dict=True, order_by="creation asc"
+		)
+
+	return frappe._dict(name=row.lesson, course=row.course) if row else None
+
+
+def get_course_quizzes(course: str) -> list[dict]:
+	"""Every quiz in `course`, in lesson order: `{quiz, quiz_title, lesson, lesson_title, source}`.
+
+	A quiz used in two lessons appears once per lesson.
+	"""
+	if not course:
+		return []
+
+	return frappe.cache().hget(CATALOGUE_KEY, course, generator=lambda: _load_course_quizzes(course))
+
+
+def _load_course_quizzes(course: str) -> list[dict]:
+	# Lessons in outline order - chapter, then lesson within it - and quizzes in
+	# the order the lesson shows them. A lesson missing from the outline sorts last.
+	rows = frappe.db.sql(
+		"""
+		SELECT i.quiz, IFNULL(q.title, i.quiz) AS quiz_title, i.lesson, l.title AS lesson_title, i.source
+		FROM `tabLesson Quiz Index` i
+		JOIN `tabCourse Lesson` l ON l.name = i.lesson
+		LEFT JOIN `tabLMS Quiz` q ON q.name = i.quiz
+		LEFT JOIN (
+			SELECT lr.lesson, MIN(cr.idx) AS chapter_idx, MIN(lr.idx) AS lesson_idx
+			FROM `tabChapter Reference` cr
+			JOIN `tabLesson Reference` lr ON lr.parent = cr.chapter
+			WHERE cr.parent = %(course)s
+			GROUP BY lr.lesson
+		) o ON o.lesson = i.lesson
+		WHERE i.course = %(course)s
+		ORDER BY o.chapter_idx IS NULL, o.chapter_idx, o.lesson_idx, l.creation, i.position, i.quiz
+		""",
+		{"course": course},
+		as_dict=True,
+	)
+	return [dict(r) for r in rows]
+
+
+def clear_course_quizzes(courses) -> None:
+	"""Drop the catalogue of `courses`, and the batch reports built on it."""
+	courses = [c for c in set(courses or []) if c]
+	if not courses:
+		return
+
+	frappe.cache().hdel(CATALOGUE_KEY, courses)
+	frappe.db.after_commit.add(lambda: frappe.cache().hdel(CATALOGUE_KEY, courses))
+
+	# The gradebook and statistics take their quiz columns and titles from here.
+	quiz_analytics.clear_course_reports(courses)
+
+
+def index_lesson(lesson: str, course: str | None, quiz_id: str | None, content: str | None) -> None:
+	"""Replace `lesson`'s rows with what its fields say now."""
+	frappe.db.delete(INDEX_DOCTYPE, {"lesson": lesson})
+	_insert(lesson, course, extract_quizzes(quiz_id, content))
+
+
+def on_lesson_update(doc, method=None):
+	"""`Course Lesson` on_update: re-index only when something that feeds it changed."""
+	# A fresh insert has no before-save doc, so every field counts as changed.
+	reindex = any(doc.has_value_changed(f) for f in ("quiz_id", "content", "course"))
+	# Title shows in the catalogue; chapter moves the lesson within its order.
+	if not reindex and not any(doc.has_value_changed(f) for f in ("title", "chapter")):
+		return
+
+	if reindex:
+		index_lesson(doc.name, doc.course, doc.get("quiz_id"), doc.get("content"))
+
+	before = doc.get_doc_before_save()
+	clear_course_quizzes([doc.course, before.course if before else None])
+
+
+def on_lesson_trash(doc, method=None):
+	"""`Course Lesson` on_trash: its quizzes no longer live anywhere through it."""
+	frappe.db.delete(INDEX_DOCTYPE, {"lesson": doc.name})
+	clear_course_quizzes([doc.course])
+
+
+def on_quiz_change(doc, method=None):
+	"""`LMS Quiz` on_update / on_trash: its title shows in every catalogue using it.
+
+	Its pass mark only feeds the batch statistics' pass rate, so a change to that
+	alone drops the reports and leaves the catalogue be.
+	"""
+	renamed = method != "on_update" or doc.has_value_changed("title")
+	if not renamed and not doc.has_value_changed("passing_percentage"):
+		return
+
+	courses = frappe.get_all(INDEX_DOCTYPE, filters={"quiz": doc.name}, pluck="course")
+	if renamed:
+		clear_course_quizzes(courses)
+	else:
+		quiz_analytics.clear_course_reports(courses)
+
+	if method == "on_trash":
+		frappe.db.delete(INDEX_DOCTYPE, {"quiz": doc.name})
+
+
+def rebuild() -> None:
+	"""Rewrite the whole index from `Course Lesson`, a chunk of lessons at a time."""
+	frappe.db.delete(INDEX_DOCTYPE)
+
+	last = ""
+	while True:
+		lessons = frappe.get_all(
+			"Course Lesson",
+			filters={"name": [">", last]},
+			fields=["name", "course", "quiz_id", "content"],
+			order_by="name asc",
+			limit_page_length=REBUILD_CHUNK,
+		)
+		if not lessons:
+			break
+
+		for l in lessons:
+			_insert(l.name, l.course, extract_quizzes(l.quiz_id, l.content))
+
+		last = lessons[-1].name
+
+	frappe.cache().delete_key(CATALOGUE_KEY)
+	for key in quiz_analytics.REPORT_KEYS:
+		frappe.cache().delete_key(key)
+	frappe.db.commit()
+
+
+def _insert(lesson: str, course: str | None, quizzes: list[tuple[str, str]]) -> None:
+	if not quizzes:
+		return
+
+	now = now_datetime()
+	user = frappe.session.user
+	frappe.db.bulk_insert(
+		INDEX_DOCTYPE,
+		fields=[
+			"name",
+			"creation",
+			"modified",
+			"owner",
+			"modified_by",
+			"quiz",
+			"lesson",
+			"course",
+			"source",
+			"position",
+		],
+		values=[
+			(f"{lesson}::{quiz}", now, now, user, user, quiz, lesson, course, source, position)
+			for position, (quiz, source) in enumerate(quizzes)
+		],
+	)
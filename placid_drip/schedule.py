@@ -0,0 +1,360 @@
+"""Compiled drip schedules, one per (batch, course), held in redis.
+
+Every outline load and every lesson open used to read `Batch Lesson Access`
+afresh, for every student, although a batch's schedule only changes when a
+facilitator saves it. On a cohort's first morning that is hundreds of identical
+IN-queries within minutes. The schedule is therefore compiled once into a plain
+`lesson -> {available_from, force_lock}` map and shared by every reader until
+something writes to it.
+
+A schedule has two sources. A `Batch Drip Rule` derives every lesson's opening
+from the batch start and the lesson's place in the outline; `Batch Lesson
+Access` rows then override it lesson by lesson. Either may be absent. The one
+rule that depends on the learner - "N days after the previous lesson is
+completed" - compiles to an `after` pointer instead of a date, and
+`for_user` resolves it against that learner's progress.
+
+The outline reads the schedule differently again: it checks every lesson of a
+course at once, and our longest courses have several hundred. For that the map
+is compiled a second time into a `LockTable` - sorted lesson names, an array of
+opening times in epoch microseconds and a force-lock bitset - so annotating an
+outline is one pass of integer comparisons with no datetime parsing, and only
+the lessons that turn out locked have a reason formatted.
+
+Invalidation is write-driven rather than time-based: rows, rules, the batch's
+start date and the course outline each drop the entries they feed. The drop is
+repeated after commit, because a reader that recompiled between the write and
+the commit would otherwise cache the pre-write schedule with nothing left to
+evict it.
+"""
+
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+import frappe
+from frappe.utils import get_datetime, get_time, getdate
+from frappe.utils.caching import request_cache
+
+CACHE_KEY = "placid_drip:drip_schedule"
+#: Versioned with the table's layout, so a deploy never reads one compiled by the old code.
+LOCK_TABLE_KEY = "placid_drip:drip_lock_table:v2"
+
+CHAPTER_INTERVAL = "Chapter Interval"
+LESSON_INTERVAL = "Lesson Interval"
+AFTER_PREVIOUS_LESSON = "After Previous Lesson"
+
+LOCKED_BY_SCHEDULE = "Locked by cohort schedule"
+AWAITING_PREVIOUS = "Opens after you complete the previous lesson"
+
+
+def get_schedule(batch: str, course: str) -> dict[str, dict]:
+	"""Map of lesson -> `{"available_from", "force_lock"}` for this batch's course.
+
+	Lessons with neither a rule nor a row are absent, which callers treat as
+	open - the same non-breaking default the per-row lookups had. Entries from
+	an After Previous Lesson rule carry `after`/`delay_days` instead of a date;
+	pass the map through `for_user` before reading them.
+	"""
+	if not batch or not course:
+		return {}
+
+	return frappe.cache().hget(
+		CACHE_KEY,
+		_key(batch, course),
+		generator=lambda: _compile(batch, course),
+	)
+
+
+def get_entry(batch: str, course: str, lesson: str, user: str | None = None) -> dict | None:
+	compiled = get_schedule(batch, course)
+	entry = compiled.get(lesson)
+	if entry and entry.get("after"):
+		return for_user(compiled, user or frappe.session.user, course).get(lesson)
+	return entry
+
+
+def for_user(compiled: dict[str, dict], user: str, course: str) -> dict[str, dict]:
+	"""Resolve progress-dependent entries for `user`; others pass through as-is.
+
+	An entry waiting on a lesson the user has not completed gets `waiting_on`
+	and no date - it has no opening time yet, only a condition.
+	"""
+	if not any(e.get("after") for e in compiled.values()):
+		return compiled
+
+	completed = _completed_at(user, course)
+	resolved = {}
+
+	for lesson, entry in compiled.items():
+		after = entry.get("after")
+		if not after:
+			resolved[lesson] = entry
+			continue
+
+		done = completed.get(after)
+		resolved[lesson] = {
+			"available_from": get_datetime(done) + timedelta(days=entry["delay_days"]) if done else None,
+			"force_lock": entry["force_lock"],
+			"waiting_on": None if done else after,
+		}
+
+	return resolved
+
+
+def lock_state(entry: dict | None, now: datetime) -> tuple[bool, datetime | None, str | None]:
+	"""(locked, opens_at, reason) for one resolved entry, as the outline words it."""
+	if not entry:
+		return False, None, None
+
+	if entry.get("force_lock"):
+		return True, None, LOCKED_BY_SCHEDULE
+
+	if entry.get("waiting_on"):
+		return True, None, AWAITING_PREVIOUS
+
+	opens = get_datetime(entry.get("available_from"))
+	if opens and now < opens:
+		return True, opens, f"Opens on {opens}"
+
+	return False, None, None
+
+
+def get_lock_table(batch: str, course: str) -> "LockTable":
+	"""The schedule for this batch's course, compiled for whole-outline checks."""
+	if not batch or not course:
+		return LockTable({})
+
+	return frappe.cache().hget(
+		LOCK_TABLE_KEY,
+		_key(batch, course),
+		generator=lambda: LockTable(get_schedule(batch, course)),
+	)
+
+
+class LockTable:
+	"""A compiled schedule laid out for checking many lessons against one `now`.
+
+	`lessons` is sorted so a lesson's slot is a bisect away; `opens` holds the
+	opening time of each slot in epoch microseconds (0 for none) - the full
+	precision of the stored datetime, so two lessons a fraction of a second apart
+	never compare equal - and `forced` one bit per slot. Entries that wait on a
+	previous lesson are kept aside in `after`, as (previous lesson, delay in
+	microseconds), since their time depends on the learner.
+	"""
+
+	__slots__ = ("after", "forced", "lessons", "opens")
+
+	def __init__(self, compiled: dict[str, dict]):
+		self.lessons = sorted(compiled)
+		self.opens = array("q", bytes(8 * len(self.lessons)))
+		self.forced = bytearray((len(self.lessons) + 7) // 8)
+		self.after = {}
+
+		for i, lesson in enumerate(self.lessons):
+			entry = compiled[lesson]
+			if entry.get("force_lock"):
+				self.forced[i >> 3] |= 1 << (i & 7)
+			if entry.get("after"):
+				self.after[i] = (entry["after"], entry["delay_days"] * _DAY)
+			elif entry.get("available_from"):
+				self.opens[i] = _to_epoch(get_datetime(entry["available_from"]))
+
+	def annotate(self, lessons, now: datetime, user: str, course: str) -> int:
+		"""Set `is_locked`/`opens_at`/`lock_reason` on each outline lesson dict.
+
+		Returns how many came out locked.
+		"""
+		now_ts = _to_epoch(now)
+		completed = _completed_epochs(user, course) if self.after else {}
+		names, opens, forced, after = self.lessons, self.opens, self.forced, self.after
+		size = len(names)
+		locked_count = 0
+
+		for lesson in lessons:
+			lesson["is_locked"] = 0
+			lesson["opens_at"] = None
+			lesson["lock_reason"] = None
+
+			i = bisect_left(names, lesson.get("name") or "")
+			if i == size or names[i] != lesson.get("name"):
+				continue
+
+			if forced[i >> 3] & (1 << (i & 7)):
+				lesson["is_locked"] = 1
+				lesson["lock_reason"] = LOCKED_BY_SCHEDULE
+				locked_count += 1
+				continue
+
+			opens_ts = opens[i]
+			if i in after:
+				previous, delay = after[i]
+				done = completed.get(previous)
+				if done is None:
+					lesson["is_locked"] = 1
+					lesson["lock_reason"] = AWAITING_PREVIOUS
+					locked_count += 1
+					continue
+				opens_ts = done + delay
+
+			if opens_ts and now_ts < opens_ts:
+				opens_at = str(_from_epoch(opens_ts))
+				lesson["is_locked"] = 1
+				lesson["opens_at"] = opens_at
+				lesson["lock_reason"] = f"Opens on {opens_at}"
+				locked_count += 1
+
+		return locked_count
+
+
+def clear_schedule(batch: str, course: str) -> None:
+	if not batch or not course:
+		return
+
+	key = _key(batch, course)
+
+	def _drop():
+		frappe.cache().hdel(CACHE_KEY, key)
+		frappe.cache().hdel(LOCK_TABLE_KEY, key)
+
+	_drop()
+	frappe.db.after_commit.add(_drop)
+
+
+def clear_rule_schedules(batch: str | None = None, course: str | None = None) -> None:
+	"""Drop every rule-derived schedule fed by `batch`'s start or `course`'s outline.
+
+	Row-only schedules do not depend on either, so they are left cached.
+	"""
+	filters = {}
+	if batch:
+		filters["batch"] = batch
+	if course:
+		filters["course"] = course
+
+	for rule in frappe.get_all("Batch Drip Rule", filters=filters, fields=["batch", "course"]):
+		clear_schedule(rule["batch"], rule["course"])
+
+
+def _key(batch: str, course: str) -> str:
+	return f"{batch}::{course}"
+
+
+def _compile(batch: str, course: str) -> dict[str, dict]:
+	compiled = _compile_rule(batch, course)
+
+	rows = frappe.get_all(
+		"Batch Lesson Access",
+		filters={"batch": batch, "course": course},
+		fields=["lesson", "available_from", "force_lock"],
+		limit_page_length=0,
+	)
+
+	# A row is the facilitator's word on one lesson; it replaces the rule outright.
+	for r in rows:
+		if r.get("lesson"):
+			compiled[r["lesson"]] = {
+				"available_from": r.get("available_from"),
+				"force_lock": int(r.get("force_lock") or 0),
+			}
+
+	return compiled
+
+
+def _compile_rule(batch: str, course: str) -> dict[str, dict]:
+	rule = frappe.db.get_value(
+		"Batch Drip Rule", {"batch": batch, "course": course}, ["rule", "interval_days"], as_dict=True
+	)
+	if not rule:
+		return {}
+
+	interval = timedelta(days=rule.interval_days or 0)
+	outline = _outline_positions(course)
+
+	if rule.rule == AFTER_PREVIOUS_LESSON:
+		compiled = {}
+		previous = None
+		for _chapter_idx, lesson in outline:
+			if previous:
+				compiled[lesson] = {
+					"after": previous,
+					"delay_days": rule.interval_days or 0,
+					"force_lock": 0,
+				}
+			previous = lesson
+		return compiled
+
+	start = get_batch_start(batch)
+	if not start:
+		# No start date yet: nothing can be dated, so the rule opens nothing early.
+		return {}
+
+	compiled = {}
+	chapter_positions = {}
+	for position, (chapter_idx, lesson) in enumerate(outline):
+		if rule.rule == CHAPTER_INTERVAL:
+			step = chapter_positions.setdefault(chapter_idx, len(chapter_positions))
+		else:
+			step = position
+
+		compiled[lesson] = {"available_from": start + interval * step, "force_lock": 0}
+
+	return compiled
+
+
+def _outline_positions(course: str) -> list[tuple[int, str]]:
+	"""(chapter idx, lesson) for every lesson of `course`, in outline order."""
+	return frappe.db.sql(
+		"""
+		SELECT cr.idx, lr.lesson
+		FROM `tabChapter Reference` cr
+		JOIN `tabLesson Reference` lr ON lr.parent = cr.chapter
+		WHERE cr.parent = %s
+		  AND IFNULL(lr.lesson, '') != ''
+		ORDER BY cr.idx ASC, lr.idx ASC
+		""",
+		(course,),
+	)
+
+
+def get_batch_start(batch: str) -> datetime | None:
+	"""The moment a batch starts: its start date at its start time, or midnight."""
+	row = frappe.db.get_value("LMS Batch", batch, ["start_date", "start_time"], as_dict=True)
+	if not row or not row.start_date:
+		return None
+
+	return datetime.combine(getdate(row.start_date), get_time(row.start_time or "00:00:00"))
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_DAY = 86_400 * 1_000_000
+
+
+def _to_epoch(value: datetime) -> int:
+	"""Microseconds since the epoch. Exact: integer division of timedeltas, no float."""
+	# Naive on both sides: site-local wall time, as `available_from` is stored.
+	return (value - _EPOCH) // _MICROSECOND
+
+
+def _from_epoch(microseconds: int) -> datetime:
+	return _EPOCH + timedelta(microseconds=microseconds)
+
+
+def _completed_epochs(user: str, course: str) -> dict[str, int]:
+	return {lesson: _to_epoch(get_datetime(at)) for lesson, at in _completed_at(user, course).items()}
+
+
+@request_cache
+def _completed_at(user: str, course: str) -> dict[str, datetime]:
+	"""lesson -> when `user` completed it, for one course. Read once per request."""
+	rows = frappe.get_all(
+		"LMS Course Progress",
+		filters={"member": user, "course": course, "status": "Complete"},
+		fields=["lesson", "creation"],
+		order_by="creation asc",
+	)
+	completed = {}
+	for r in rows:
+		completed.setdefault(r["lesson"], r["creation"])
+	return completed
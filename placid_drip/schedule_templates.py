@@ -0,0 +1,155 @@
+"""Drip schedule templates: one relative schedule per course, applied to many batches.
+
+The same course runs for dozens of parallel cohorts that differ only in their
+start date, and authoring `Batch Lesson Access` lesson by lesson for each of them
+is thousands of hand-made rows that all say the same thing. A template says it
+once - "lesson N opens X days after the batch starts" - and `apply_template`
+turns it into absolute rows for every batch at once.
+
+The rows stay absolute on purpose. The lock check, the compiled schedule and the
+facilitator's lock screen all keep reading plain timestamps; a template is a way
+of *writing* the table, not a second thing every reader has to evaluate.
+
+Rows a template wrote carry its name in `schedule_template`. That marker is what
+lets a batch's schedule follow it when its start date moves, or when the template
+itself is edited, without trampling a lesson somebody has since adjusted by hand -
+a hand edit clears the marker, and recomputation only touches marked rows.
+"""
+
+from datetime import timedelta
+
+import frappe
+from frappe import _
+
+from placid_drip.api.batch_lesson_access import apply_lesson_access_changes
+from placid_drip.facilitator import can_manage_batch_course
+from placid_drip.schedule import get_batch_start
+
+
+def apply_template(template: str, batches: list[str]) -> dict:
+	"""Materialise `template` into each of `batches`, overwriting what is there.
+
+	An explicit apply is the facilitator asking for this schedule, so lessons
+	that had been set by hand take the template's values too. Returns the
+	per-batch insert/update/delete counts, plus the batches that were skipped
+	because they do not carry the course or have no start date yet.
+	"""
+	doc = frappe.get_doc("Drip Schedule Template", template)
+	batches = [b for b in dict.fromkeys(batches or []) if b]
+
+	result = {"applied": {}, "not_in_batch": [], "no_start_date": []}
+	if not batches:
+		return result
+
+	carrying = set(
+		frappe.get_all(
+			"Batch Course",
+			filters={"parenttype": "LMS Batch", "parent": ["in", batches], "course": doc.course},
+			pluck="parent",
+		)
+	)
+
+	for batch in batches:
+		if batch not in carrying:
+			result["not_in_batch"].append(batch)
+			continue
+
+		counts = materialize(doc, batch, keep_hand_edits=False)
+		if counts is None:
+			result["no_start_date"].append(batch)
+		else:
+			result["applied"][batch] = counts
+
+	return result
+
+
+def materialize(doc, batch: str, keep_hand_edits: bool = True) -> dict | None:
+	"""Write the rows `doc` implies for `batch`. `None` if the batch has no start.
+
+	With `keep_hand_edits`, lessons whose row was last written by something other
+	than this template are left alone - that is the recompute path. Rows this
+	template wrote for lessons it no longer lists are removed either way.
+	"""
+	start = get_batch_start(batch)
+	if not start:
+		return None
+
+	existing = {
+		r["lesson"]: r.get("schedule_template")
+		for r in frappe.get_all(
+			"Batch Lesson Access",
+			filters={"batch": batch, "course": doc.course},
+			fields=["lesson", "schedule_template"],
+			limit_page_length=0,
+		)
+	}
+
+	changes = []
+	listed = set()
+
+	for row in doc.lessons:
+		if not row.lesson:
+			continue
+		listed.add(row.lesson)
+
+		if keep_hand_edits and row.lesson in existing and existing[row.lesson] != doc.name:
+			continue
+
+		changes.append(
+			{
+				"lesson": row.lesson,
+				"available_from": start + timedelta(days=row.offset_days or 0),
+				"force_lock": int(row.force_lock or 0),
+			}
+		)
+
+	for lesson, written_by in existing.items():
+		if written_by == doc.name and lesson not in listed:
+			changes.append({"lesson": lesson, "available_from": None, "force_lock": 0})
+
+	if not changes:
+		return {"inserted": 0, "updated": 0, "deleted": 0}
+
+	return apply_lesson_access_changes(batch, doc.course, changes, schedule_template=doc.name)
+
+
+def get_template_batches(template: str) -> list[str]:
+	"""Batches that currently hold at least one row written by `template`."""
+	return frappe.get_all(
+		"Batch Lesson Access",
+		filters={"schedule_template": template},
+		pluck="batch",
+		distinct=True,
+	)
+
+
+def recompute_template(doc) -> None:
+	"""Re-materialise an edited template into every batch already using it."""
+	for batch in get_template_batches(doc.name):
+		materialize(doc, batch, keep_hand_edits=True)
+
+
+def on_batch_update(doc, method=None):
+	"""`LMS Batch` on_update: move template-written rows with the start date."""
+	if not (doc.has_value_changed("start_date") or doc.has_value_changed("start_time")):
+		return
+
+	templates = frappe.get_all(
+		"Batch Lesson Access",
+		filters={"batch": doc.name, "schedule_template": ["is", "set"]},
+		pluck="schedule_template",
+		distinct=True,
+	)
+
+	for template in templates:
+		materialize(frappe.get_doc("Drip Schedule Template", template), doc.name, keep_hand_edits=True)
+
+
+def assert_can_apply(course: str, batches: list[str], user: str) -> None:
+	"""Same bar as scheduling the lessons one by one: manage `course` in each batch."""
+	forbidden = [b for b in batches if not can_manage_batch_course(user, b, course)]
+	if forbidden:
+		frappe.throw(
+			_("You can only schedule batches you evaluate or instruct: {0}").format(", ".join(forbidden)),
+			frappe.PermissionError,
+		)
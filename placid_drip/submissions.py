@@ -0,0 +1,159 @@
+"""Reading a batch's quiz submissions a page, or a file, at a time.
+
+The two submission reports each read everything in one go: one capped itself at
+5000 rows and said nothing when it cut a cohort off, the other had no cap and
+held every row in memory. `get_page` walks the same rows by keyset instead -
+ordered on (creation, name), with an opaque cursor naming the last row seen - so
+a page costs the same however deep into the list it is, and rows inserted while
+someone pages never shift or repeat what they see.
+
+`export` is the other way to get all of them: it reads through an unbuffered
+cursor and writes CSV or XLSX into a spooled temporary file, which moves to disk
+past a few megabytes, so a large cohort's export does not grow the worker.
+"""
+
+import base64
+import csv
+import io
+import json
+from tempfile import SpooledTemporaryFile
+
+import frappe
+from frappe import _
+from frappe.utils import cint, get_datetime
+
+PAGE_LENGTH = 500
+MAX_PAGE_LENGTH = 5000
+
+#: Bytes an export keeps in memory before the spool moves to disk.
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+#: CSV rows formatted between writes to the spool.
+CSV_CHUNK = 1000
+
+EXPORT_COLUMNS = ["name", "quiz", "member", "member_name", "score", "percentage", "creation"]
+
+EXPORT_FORMATS = {
+	"csv": "text/csv",
+	"xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def get_page(batch: str, quizzes: list[str], fields: list[str], cursor=None, page_length=None) -> dict:
+	"""One page of `batch`'s submissions to `quizzes`, newest first.
+
+	`{"rows": [...], "next_cursor": str | None}` - pass `next_cursor` back to get
+	the page after; it is `None` on the last page. `fields` are submission
+	columns; every row also carries `member_name`.
+	"""
+	page_length = min(cint(page_length) or PAGE_LENGTH, MAX_PAGE_LENGTH)
+	after = decode_cursor(cursor) if cursor else None
+
+	rows = frappe.db.sql(
+		_query(fields, after) + " LIMIT %(limit)s",
+		_params(batch, quizzes, after, limit=page_length + 1),
+		as_dict=True,
+	)
+
+	# One row past the page tells us whether there is another, without a count.
+	more = len(rows) > page_length
+	rows = rows[:page_length]
+
+	return {"rows": rows, "next_cursor": encode_cursor(rows[-1]) if more else None}
+
+
+def encode_cursor(row) -> str:
+	raw = json.dumps([str(row["creation"]), row["name"]]).encode()
+	return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+	try:
+		creation, name = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+		return get_datetime(creation), name
+	except Exception:
+		frappe.throw(_("Invalid cursor"))
+
+
+def export(batch: str, quizzes: list[str], fmt: str = "csv") -> tuple[SpooledTemporaryFile, str]:
+	"""Every submission `get_page` would walk, written to a rewound spool.
+
+	Returns (file, mimetype). The caller owns the file.
+	"""
+	if fmt not in EXPORT_FORMATS:
+		frappe.throw(_("Unsupported export format: {0}").format(fmt))
+
+	spool = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+	columns = [c for c in EXPORT_COLUMNS if c != "member_name"]
+
+	# Nothing else may touch the connection until the iterator is drained.
+	with frappe.db.unbuffered_cursor():
+		rows = frappe.db.sql(_query(columns, None), _params(batch, quizzes, None), as_iterator=True)
+		if fmt == "csv":
+			_write_csv(spool, rows)
+		else:
+			_write_xlsx(spool, rows)
+
+	spool.seek(0)
+	return spool, EXPORT_FORMATS[fmt]
+
+
+def _query(fields: list[str], after) -> str:
+	columns = ", ".join(f"s.`{f}`" for f in fields)
+	keyset = "AND (s.creation < %(after_creation)s OR (s.creation = %(after_creation)s AND s.name < %(after_name)s))"
+
+	return f"""
+		SELECT {columns}, IFNULL(u.full_name, s.member) AS member_name
+		FROM `tabLMS Quiz Submission` s
+		LEFT JOIN `tabUser` u ON u.name = s.member
+		WHERE s.quiz IN %(quizzes)s
+		  AND s.member IN (SELECT member FROM `tabLMS Batch Enrollment` WHERE batch = %(batch)s)
+		  {keyset if after else ""}
+		ORDER BY s.creation DESC, s.name DESC
+	"""
+
+
+def _params(batch: str, quizzes: list[str], after, **extra) -> dict:
+	params = {"batch": batch, "quizzes": tuple(quizzes), **extra}
+	if after:
+		params["after_creation"], params["after_name"] = after
+	return params
+
+
+def _write_csv(spool, rows) -> None:
+	buffer = io.StringIO()
+	writer = csv.writer(buffer)
+	writer.writerow(EXPORT_COLUMNS)
+
+	# BOM first so Excel opens names with accents correctly; then the text
+	# buffer is drained into the spool every CSV_CHUNK rows.
+	spool.write("\ufeff".encode())
+	for i, r in enumerate(rows, 1):
+		writer.writerow(_export_row(r))
+		if i % CSV_CHUNK == 0:
+			_drain(buffer, spool)
+	_drain(buffer, spool)
+
+
+def _drain(buffer: io.StringIO, spool) -> None:
+	spool.write(buffer.getvalue().encode())
+	buffer.seek(0)
+	buffer.truncate()
+
+
+def _write_xlsx(spool, rows) -> None:
+	from openpyxl import Workbook
+
+	# write_only streams rows out as they are appended instead of building a sheet.
+	workbook = Workbook(write_only=True)
+	sheet = workbook.create_sheet("Submissions")
+	sheet.append(EXPORT_COLUMNS)
+	for r in rows:
+		sheet.append(_export_row(r))
+	workbook.save(spool)
+
+
+def _export_row(row) -> list:
+	# SELECT order is the export columns minus member_name, then member_name.
+	name, quiz, member, score, percentage, creation, member_name = row
+	return [name, quiz, member, member_name, score, percentage, creation]
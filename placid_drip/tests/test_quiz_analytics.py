@@ -0,0 +1,46 @@
+from frappe.tests.utils import FrappeTestCase
+
+from placid_drip.quiz_analytics import _collect_buckets, _percentile
+
+
+class TestPercentile(FrappeTestCase):
+	def test_nearest_rank(self):
+		counts = [0] * 101
+		for point in (10, 20, 30, 40, 50):
+			counts[point] = 1
+
+		self.assertEqual(_percentile(counts, 5, 10), 10)
+		self.assertEqual(_percentile(counts, 5, 50), 30)
+		self.assertEqual(_percentile(counts, 5, 90), 50)
+
+	def test_repeated_scores(self):
+		counts = [0] * 101
+		counts[70] = 3
+		counts[100] = 1
+
+		self.assertEqual(_percentile(counts, 4, 25), 70)
+		self.assertEqual(_percentile(counts, 4, 75), 70)
+		self.assertEqual(_percentile(counts, 4, 90), 100)
+
+
+class TestCollectBuckets(FrappeTestCase):
+	def test_rows_fold_into_one_histogram_per_quiz(self):
+		buckets = _collect_buckets(
+			[
+				("quiz-a", 40, 2, 81.0, 0),
+				("quiz-a", 90, 1, 90.5, 1),
+				("quiz-b", 100, 3, 300, None),
+			]
+		)
+
+		a = buckets["quiz-a"]
+		self.assertEqual(len(a["counts"]), 101)
+		self.assertEqual(a["counts"][40], 2)
+		self.assertEqual(a["counts"][90], 1)
+		self.assertEqual(a["students"], 3)
+		self.assertEqual(a["total"], 171.5)
+		self.assertEqual(a["passed"], 1)
+		self.assertEqual(_percentile(a["counts"], a["students"], 50), 40)
+
+		self.assertEqual(buckets["quiz-b"]["counts"][100], 3)
+		self.assertEqual(buckets["quiz-b"]["passed"], 0)
@@ -0,0 +1,43 @@
+import json
+
+from frappe.tests.utils import FrappeTestCase
+
+from placid_drip.quiz_index import extract_quizzes
+
+
+def _content(*blocks):
+	return json.dumps({"blocks": list(blocks)})
+
+
+class TestExtractQuizzes(FrappeTestCase):
+	def test_quiz_id_comes_first(self):
+		content = _content({"type": "quiz", "data": {"quiz": "embedded"}})
+		self.assertEqual(
+			extract_quizzes("linked", content),
+			[("linked", "quiz_id"), ("embedded", "content")],
+		)
+
+	def test_every_block_key_is_read(self):
+		content = _content(
+			{"type": "quiz", "data": {"quiz": "a"}},
+			{"type": "quiz", "data": {"quiz_id": "b"}},
+			{"type": "quiz", "data": {"id": "c"}},
+		)
+		self.assertEqual([q for q, _source in extract_quizzes(None, content)], ["a", "b", "c"])
+
+	def test_each_quiz_once(self):
+		content = _content(
+			{"type": "quiz", "data": {"quiz": "linked"}},
+			{"type": "quiz", "data": {"quiz": "embedded"}},
+			{"type": "quiz", "data": {"quiz": "embedded"}},
+		)
+		self.assertEqual(
+			extract_quizzes("linked", content),
+			[("linked", "quiz_id"), ("embedded", "content")],
+		)
+
+	def test_other_blocks_and_bad_content_are_ignored(self):
+		content = _content({"type": "paragraph", "data": {"quiz": "nope"}}, "not a block", {"type": "quiz"})
+		self.assertEqual(extract_quizzes(None, content), [])
+		self.assertEqual(extract_quizzes("linked", "{not json"), [("linked", "quiz_id")])
+		self.assertEqual(extract_quizzes(None, None), [])
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from placid_drip.schedule import AWAITING_PREVIOUS, LOCKED_BY_SCHEDULE, LockTable
+
+NOW = datetime(2026, 3, 2, 9, 0)
+
+
+def _outline(*names):
+	return [{"name": name} for name in names]
+
+
+class TestLockTable(FrappeTestCase):
+	def test_dates_and_force_lock(self):
+		table = LockTable(
+			{
+				"past": {"available_from": NOW - timedelta(days=1)},
+				"future": {"available_from": NOW + timedelta(days=1)},
+				"forced": {"available_from": NOW - timedelta(days=1), "force_lock": 1},
+			}
+		)
+		lessons = _outline("past", "future", "forced", "unscheduled")
+
+		self.assertEqual(table.annotate(lessons, NOW, "student@example.com", "course"), 2)
+
+		past, future, forced, unscheduled = lessons
+		self.assertEqual(past["is_locked"], 0)
+		self.assertEqual(future["is_locked"], 1)
+		self.assertEqual(future["opens_at"], str(NOW + timedelta(days=1)))
+		self.assertEqual(forced["lock_reason"], LOCKED_BY_SCHEDULE)
+		self.assertIsNone(forced["opens_at"])
+		self.assertEqual(unscheduled["is_locked"], 0)
+
+	def test_opening_is_exact_to_the_microsecond(self):
+		opens = NOW + timedelta(microseconds=500)
+		table = LockTable({"lesson": {"available_from": opens}})
+
+		before = _outline("lesson")
+		table.annotate(before, NOW, "student@example.com", "course")
+		self.assertEqual(before[0]["is_locked"], 1)
+		self.assertEqual(before[0]["opens_at"], str(opens))
+
+		at = _outline("lesson")
+		table.annotate(at, opens, "student@example.com", "course")
+		self.assertEqual(at[0]["is_locked"], 0)
+
+	def test_after_previous_waits_for_completion(self):
+		table = LockTable({"second": {"after": "first", "delay_days": 2}})
+
+		with patch("placid_drip.schedule._completed_epochs", return_value={}):
+			lessons = _outline("second")
+			table.annotate(lessons, NOW, "student@example.com", "course")
+		self.assertEqual(lessons[0]["is_locked"], 1)
+		self.assertEqual(lessons[0]["lock_reason"], AWAITING_PREVIOUS)
+
+	def test_after_previous_opens_delay_after_completion(self):
+		from placid_drip.schedule import _to_epoch
+
+		table = LockTable({"second": {"after": "first", "delay_days": 2}})
+		done = NOW - timedelta(days=1)
+
+		with patch("placid_drip.schedule._completed_epochs", return_value={"first": _to_epoch(done)}):
+			waiting = _outline("second")
+			table.annotate(waiting, NOW, "student@example.com", "course")
+			opened = _outline("second")
+			table.annotate(opened, NOW + timedelta(days=1), "student@example.com", "course")
+
+		self.assertEqual(waiting[0]["is_locked"], 1)
+		self.assertEqual(waiting[0]["opens_at"], str(done + timedelta(days=2)))
+		self.assertEqual(opened[0]["is_locked"], 0)
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from placid_drip.submissions import decode_cursor, encode_cursor
+
+
+class TestCursor(FrappeTestCase):
+	def test_round_trip(self):
+		row = {"creation": datetime(2026, 3, 2, 9, 30, 15, 123456), "name": "abc123"}
+		self.assertEqual(decode_cursor(encode_cursor(row)), (row["creation"], row["name"]))
+
+	def test_cursor_is_url_safe(self):
+		cursor = encode_cursor({"creation": datetime(2026, 3, 2), "name": "a/b+c?d"})
+		self.assertRegex(cursor, r"^[A-Za-z0-9_\-=]+$")
+
+	def test_invalid_cursor_is_rejected(self):
+		for cursor in ("not base64!", "bm90IGpzb24=", encode_cursor({"creation": "x", "name": "y"})[:-4]):
+			with self.assertRaises(frappe.ValidationError):
+				decode_cursor(cursor)
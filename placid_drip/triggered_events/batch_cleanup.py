@@ -6,61 +6,57 @@ def on_batch_enrollment_removed(doc, method=None):
     Remove course enrollments for that member for courses in this batch,
     BUT ONLY if the member isn't in any other batch that includes that course.
     """
-    member = doc.member
-    batch = doc.batch
-
-    # Get all courses linked to this batch
-    batch_courses = frappe.get_all(
-        "Batch Course",
-        filters={"parent": batch},
-        pluck="course",
-    )
-
-    if not batch_courses:
+    if doc.flags.get("roster_cleanup_deferred"):
+        # `delete_documents` is removing many members of this batch and runs
+        # `remove_batch_course_enrollments` for all of them in one pass.
         return
 
-    for course in batch_courses:
-        # Is member enrolled in ANY OTHER batch that also has this course?
-        still_has_course_elsewhere = frappe.db.exists(
-            "LMS Batch Enrollment",
-            {
-                "member": member,
-                "batch": ["!=", batch],
-                # join condition via subquery-like check:
-                # We'll check if that other batch has this course.
-            },
-        )
-
-        # The above check alone isn't enough (it doesn't filter by course),
-        # so do a proper query:
-        if _member_has_course_in_other_batch(member, batch, course):
-            continue
+    remove_batch_course_enrollments(doc.batch, [doc.member])
 
-        # If no other batches keep them in this course, remove course enrollment.
-        enrollment_name = frappe.db.get_value(
-            "LMS Enrollment",
-            {"member": member, "course": course},
-            "name",
-        )
-        if enrollment_name:
-            frappe.delete_doc("LMS Enrollment", enrollment_name, ignore_permissions=True, force=True)
 
+def remove_batch_course_enrollments(batch: str, members: list[str]) -> int:
+    """Drop the course enrollments `members` held only through `batch`.
 
-def _member_has_course_in_other_batch(member: str, removed_batch: str, course: str) -> bool:
-    """Return True if the member is enrolled in any other batch that includes this course."""
-    BatchEnrollment = frappe.qb.DocType("LMS Batch Enrollment")
-    BatchCourse = frappe.qb.DocType("Batch Course")
-
-    # Join: other batch enrollments for member + courses attached to those batches
-    res = (
-        frappe.qb.from_(BatchEnrollment)
-        .join(BatchCourse)
-        .on(BatchCourse.parent == BatchEnrollment.batch)
-        .select(BatchEnrollment.name)
-        .where(BatchEnrollment.member == member)
-        .where(BatchEnrollment.batch != removed_batch)
-        .where(BatchCourse.course == course)
-        .limit(1)
-    ).run(as_dict=True)
-
-    return bool(res)
\ No newline at end of file
+    One query finds them - every LMS Enrollment for a course of this batch that
+    no other batch of the member's also carries - however many members and
+    courses are involved. Each is then deleted as a document rather than in one
+    bulk DELETE, so the lms app's own on_trash hooks run and a Deleted Document is
+    kept; the per-course lookups were the cost, not the deletes. Returns how many
+    went.
+    """
+    members = [m for m in set(members or []) if m]
+    if not batch or not members:
+        return 0
+
+    enrollments = _enrollments_held_only_via(batch, members)
+    # `force` as before: a leftover link to the enrollment must not abort the
+    # roster removal this runs inside.
+    for name in enrollments:
+        frappe.delete_doc("LMS Enrollment", name, ignore_permissions=True, force=True)
+
+    return len(enrollments)
+
+
+def _enrollments_held_only_via(batch: str, members: list[str]) -> list[str]:
+    return frappe.db.sql_list(
+        """
+        SELECT e.name
+        FROM `tabLMS Enrollment` e
+        JOIN `tabBatch Course` bc
+            ON bc.course = e.course
+            AND bc.parent = %(batch)s
+            AND bc.parenttype = 'LMS Batch'
+        WHERE e.member IN %(members)s
+          AND NOT EXISTS (
+            SELECT 1
+            FROM `tabLMS Batch Enrollment` other
+            JOIN `tabBatch Course` obc
+                ON obc.parent = other.batch
+                AND obc.parenttype = 'LMS Batch'
+            WHERE other.member = e.member
+              AND other.batch != %(batch)s
+              AND obc.course = e.course
+          )
+        """,
+        {"batch": batch, "members": tuple(members)},
+    )
@@ -0,0 +1,87 @@
+"""Doc events that evict placid_drip's redis caches when their sources change.
+
+Kept apart from the cleanup handlers so that the question "what invalidates
+this cache" has one place to be answered. Every handler here only evicts - the
+next reader rebuilds - so a handler firing more often than strictly necessary
+costs a rebuild, never a wrong answer.
+"""
+
+from placid_drip import access, quiz_index, schedule
+from placid_drip.facilitator import clear_facilitated_batches
+from placid_drip.quiz_analytics import clear_batch_reports
+
+
+def on_batch_enrollment_change(doc, method=None):
+	"""`LMS Batch Enrollment` after_insert / on_trash: the member's batches moved."""
+	access.clear_course_batches([doc.member])
+	clear_batch_reports([doc.batch])
+
+
+def on_batch_update(doc, method=None):
+	"""`LMS Batch` on_update: instructors, evaluators or courses may have moved.
+
+	The facilitated-batch index is dropped on every save, since `modified` - its
+	sort key - changes with each one.
+
+	`add_batch_course` saves through the parent, so this is also what covers a
+	course attached from the batch page. For the course -> batch map only the
+	batch's own members can be affected, and only when its course list changed.
+
+	A moved start date re-dates every rule-based schedule the batch has.
+	"""
+	clear_facilitated_batches()
+
+	if doc.has_value_changed("start_date") or doc.has_value_changed("start_time"):
+		schedule.clear_rule_schedules(batch=doc.name)
+
+	before = doc.get_doc_before_save()
+	if before and _course_set(before) == _course_set(doc):
+		return
+
+	access.clear_batch_members(doc.name)
+	clear_batch_reports([doc.name])
+
+
+def on_batch_trash(doc, method=None):
+	"""`LMS Batch` on_trash: its instructors and evaluators facilitate one fewer."""
+	clear_facilitated_batches()
+
+
+def on_batch_course_trash(doc, method=None):
+	"""`Batch Course` on_trash: a course removed from a batch via `delete_documents`.
+
+	Its evaluator may have facilitated the batch through that row alone.
+	"""
+	if doc.parenttype == "LMS Batch":
+		clear_facilitated_batches()
+		access.clear_batch_members(doc.parent)
+		clear_batch_reports([doc.parent])
+
+
+def on_course_outline_change(doc, method=None):
+	"""`LMS Course` on_update, `Course Chapter` / `Course Lesson` on_update and on_trash.
+
+	Interval and after-previous rules are laid out by outline position, so any
+	lesson or chapter coming, going or moving re-lays them. Reorders, which write
+	the reference rows' `idx` directly, are covered by the overrides in
+	`placid_drip.overrides.lms_api`. A lesson moved to another course drops both.
+
+	The quiz catalogue is listed in outline order too, so course and chapter
+	changes drop it as well; lesson saves already do through `quiz_index`.
+	"""
+	if doc.doctype == "LMS Course":
+		courses = {doc.name}
+	else:
+		before = doc.get_doc_before_save()
+		courses = {doc.course, before.course if before else None}
+
+	courses.discard(None)
+	for course in courses:
+		schedule.clear_rule_schedules(course=course)
+
+	if courses and doc.doctype != "Course Lesson":
+		quiz_index.clear_course_quizzes(list(courses))
+
+
+def _course_set(batch_doc) -> set[str]:
+	return {row.course for row in (batch_doc.get("courses") or []) if row.course}
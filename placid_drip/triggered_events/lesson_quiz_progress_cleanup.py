@@ -1,7 +1,22 @@
 import frappe
-import json
+
+from placid_drip.quiz_index import get_lesson_for_quiz
+
+#: Per (member, course): lessons with a submitted quiz the sync job has not seen yet.
+PENDING_KEY = "placid_drip:quiz_progress_pending"
+
+#: Seconds a sync job may hold its (member, course) before the lock lapses.
+SYNC_LOCK_TIMEOUT = 300
+
 
 def on_quiz_submission_after_insert(doc, method=None):
+    """Queue the lesson for its (member, course) and leave the progress work to a job.
+
+    This runs inside the student's submit request. During a timed exam a whole
+    cohort submits at once, and doing the progress writes here made every submit
+    wait on the same enrollment rows. Only the lesson lookup - one indexed read -
+    stays in the request.
+    """
     frappe.logger("quiz_progress").error(
         f"[QUIZ HOOK] fired | submission={doc.name} quiz={doc.quiz} member={doc.member}"
     )
@@ -15,8 +30,8 @@ def on_quiz_submission_after_insert(doc, method=None):
     # Try to infer course from the quiz
     course = frappe.db.get_value("LMS Quiz", quiz, "course")
 
-    # Fallback: scan all lessons (slower but safe)
-    lesson = _find_lesson_for_quiz(course, quiz)
+    # One indexed lookup in Lesson Quiz Index (kept current on lesson save)
+    lesson = get_lesson_for_quiz(quiz, course)
 
     frappe.logger("quiz_progress").error(
         f"[QUIZ HOOK] resolved lesson = {lesson}"
@@ -25,105 +40,83 @@ def on_quiz_submission_after_insert(doc, method=None):
     if not lesson:
         return
 
-    _mark_lesson_complete(
+    course = lesson["course"]
+    key = _pending_key(member, course)
+    lesson_name = lesson["name"]
+
+    # Both after commit, lesson first: a job that finds the lesson must also see
+    # the submission. Not deduplicated - a job that finds another one working on
+    # this (member, course) returns at once, and the working one re-checks after
+    # it lets go, so nothing added meanwhile is left behind.
+    frappe.db.after_commit.add(lambda: frappe.cache().sadd(key, lesson_name))
+    frappe.enqueue(
+        "placid_drip.triggered_events.lesson_quiz_progress_cleanup.sync_quiz_progress",
+        queue="short",
+        enqueue_after_commit=True,
         member=member,
-        course=lesson["course"],
-        lesson=lesson["name"],
+        course=course,
     )
 
 
-def _find_lesson_for_quiz(course, quiz):
-    filters = {}
-    if course:
-        filters["course"] = course
+def sync_quiz_progress(member, course):
+    """Complete the lessons `member` has submitted quizzes from in `course`.
 
-    lessons = frappe.get_all(
-        "Course Lesson",
-        filters=filters,
-        fields=["name", "course", "content"],
-        limit_page_length=2000,
-    )
+    Lessons queue up in a redis set per (member, course); one job at a time drains
+    it under a lock, so however many submissions arrive together they are written
+    by one worker. Completing a lesson twice is guarded against, so running this
+    again is harmless.
+    """
+    cache = frappe.cache()
+    key = _pending_key(member, course)
 
-    for l in lessons:
-        if not l.content:
-            continue
-        try:
-            data = json.loads(l.content)
-        except Exception:
-            continue
+    while cache.smembers(key):
+        lock = cache.lock(cache.make_key(f"{key}:lock"), timeout=SYNC_LOCK_TIMEOUT)
+        if not lock.acquire(blocking=False):
+            # The holder looks at the set again after releasing.
+            return
 
-        for block in data.get("blocks", []):
-            if block.get("type") == "quiz":
-                d = block.get("data") or {}
-                if (
-                    d.get("quiz") == quiz
-                    or d.get("quiz_id") == quiz
-                    or d.get("id") == quiz
-                ):
-                    return {
-                        "name": l.name,
-                        "course": l.course,
-                    }
-
-    return None
-
-
-def _mark_lesson_complete(member, course, lesson):
-    exists = frappe.db.exists(
-        "LMS Course Progress",
-        {
-            "member": member,
-            "course": course,
-            "lesson": lesson,
-            "status": "Complete",
-        },
-    )
+        try:
+            while lessons := [_decode(l) for l in cache.smembers(key)]:
+                # Each inserted progress row moves the enrollment's counter itself
+                # (`progress.on_progress_update`), so there is nothing to recount here.
+                _mark_lessons_complete(member, course, lessons)
+                frappe.db.commit()
 
-    if exists:
-        return
+                # Only once committed, so a failed run leaves them for the next job.
+                cache.srem(key, *lessons)
+        finally:
+            lock.release()
 
-    progress = frappe.new_doc("LMS Course Progress")
-    progress.update(
-        {
-            "member": member,
-            "course": course,
-            "lesson": lesson,
-            "status": "Complete",
-        }
-    )
-    progress.insert(ignore_permissions=True)
 
-    _update_enrollment_progress(member, course)
+def _pending_key(member, course):
+    return f"{PENDING_KEY}:{member}::{course}"
 
 
-def _update_enrollment_progress(member, course):
-    enrollment = frappe.db.get_value(
-        "LMS Enrollment",
-        {"member": member, "course": course},
-        "name",
-    )
-    if not enrollment:
-        return
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
 
-    total = frappe.db.count("Course Lesson", {"course": course})
-    if not total:
-        return
 
-    completed = frappe.db.count(
-        "LMS Course Progress",
-        {
-            "member": member,
-            "course": course,
-            "status": "Complete",
-        },
+def _mark_lessons_complete(member, course, lessons):
+    """Complete each of `lessons` for `member`, skipping those already complete."""
+    done = set(
+        frappe.get_all(
+            "LMS Course Progress",
+            filters={"member": member, "course": course, "lesson": ["in", lessons], "status": "Complete"},
+            pluck="lesson",
+        )
     )
 
-    pct = int((completed / total) * 100)
+    for lesson in lessons:
+        if lesson in done:
+            continue
 
-    # ✅ progress is numeric, NOT "50%"
-    frappe.db.set_value(
-        "LMS Enrollment",
-        enrollment,
-        "progress",
-        pct,
-    )
\ No newline at end of file
+        progress = frappe.new_doc("LMS Course Progress")
+        progress.update(
+            {
+                "member": member,
+                "course": course,
+                "lesson": lesson,
+                "status": "Complete",
+            }
+        )
+        progress.insert(ignore_permissions=True)
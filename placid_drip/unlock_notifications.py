@@ -0,0 +1,164 @@
+"""Tell students when a drip-locked lesson opens.
+
+Nothing used to: a student waiting on tomorrow's lesson found out by reloading
+the outline, and a cohort doing that around the hour a lesson was due is a large
+share of `get_course_outline` traffic. `notify_unlocked_lessons` runs from the
+scheduler and mails each member of a batch once per run, listing everything in
+that batch that opened since the previous run.
+
+The scan is a window, not a sweep: only openings between the last run and now
+are looked at, read through the `available_from` index. Rule-derived openings
+have no row to index, so batches with a dated `Batch Drip Rule` are checked
+through their compiled schedule instead - one entry per batch and course, which
+is small next to the row table. "After previous lesson" openings are left out;
+they open when the student completes something, and the student already knows.
+
+The high-water mark is written in the same transaction as the queued mails, so
+a run that fails part-way rolls back both and the next run retries the window.
+"""
+
+from datetime import timedelta
+
+import frappe
+from frappe import _
+from frappe.utils import get_datetime, get_url, now_datetime
+
+from placid_drip import schedule
+
+#: `__global` key holding the end of the last window that was notified.
+LAST_RUN_KEY = "placid_drip_unlock_notified_until"
+
+#: How far back a run will look, however long the scheduler was off. Openings
+#: older than this are not news any more.
+MAX_LOOKBACK = timedelta(days=1)
+
+
+def notify_unlocked_lessons():
+	"""Scheduler entry point: mail every member about lessons opened since last run."""
+	until = now_datetime()
+	last = frappe.db.get_global(LAST_RUN_KEY)
+	since = max(get_datetime(last), until - MAX_LOOKBACK) if last else until - timedelta(hours=1)
+
+	opened = get_opened_lessons(since, until)
+	if opened:
+		_notify(opened)
+
+	frappe.db.set_global(LAST_RUN_KEY, str(until))
+
+
+def get_opened_lessons(since, until) -> dict[str, dict[str, list[str]]]:
+	"""batch -> course -> lessons whose opening fell in (since, until]."""
+	pairs = set(
+		frappe.db.sql(
+			"""
+			SELECT DISTINCT batch, course
+			FROM `tabBatch Lesson Access`
+			WHERE available_from > %(since)s
+			  AND available_from <= %(until)s
+			  AND IFNULL(force_lock, 0) = 0
+			""",
+			{"since": since, "until": until},
+		)
+	)
+
+	pairs.update(
+		frappe.db.sql(
+			"""
+			SELECT r.batch, r.course
+			FROM `tabBatch Drip Rule` r
+			JOIN `tabLMS Batch` b ON b.name = r.batch
+			WHERE r.rule != %(after_previous)s
+			  AND (b.end_date IS NULL OR b.end_date >= %(since_date)s)
+			""",
+			{"after_previous": schedule.AFTER_PREVIOUS_LESSON, "since_date": since.date()},
+		)
+	)
+
+	# Read the compiled schedule rather than the rows themselves, so a row that
+	# overrides a rule - or a rule date a row has moved - is judged by what
+	# students actually see.
+	opened = {}
+	for batch, course in pairs:
+		lessons = [
+			lesson
+			for lesson, entry in schedule.get_schedule(batch, course).items()
+			if not entry.get("force_lock")
+			and entry.get("available_from")
+			and since < get_datetime(entry["available_from"]) <= until
+		]
+		if lessons:
+			opened.setdefault(batch, {})[course] = lessons
+
+	return opened
+
+
+def _notify(opened: dict[str, dict[str, list[str]]]) -> None:
+	batches = list(opened)
+	courses = {c for by_course in opened.values() for c in by_course}
+	lessons = {l for by_course in opened.values() for ls in by_course.values() for l in ls}
+
+	batch_titles = dict(
+		frappe.get_all("LMS Batch", filters={"name": ["in", batches]}, fields=["name", "title"], as_list=True)
+	)
+	course_titles = dict(
+		frappe.get_all(
+			"LMS Course", filters={"name": ["in", list(courses)]}, fields=["name", "title"], as_list=True
+		)
+	)
+	lesson_titles = dict(
+		frappe.get_all(
+			"Course Lesson", filters={"name": ["in", list(lessons)]}, fields=["name", "title"], as_list=True
+		)
+	)
+
+	members = {}
+	for batch, member in frappe.db.sql(
+		"""
+		SELECT e.batch, e.member
+		FROM `tabLMS Batch Enrollment` e
+		JOIN `tabUser` u ON u.name = e.member
+		WHERE e.batch IN %(batches)s
+		  AND u.enabled = 1
+		""",
+		{"batches": batches},
+	):
+		members.setdefault(batch, []).append(member)
+
+	for batch, by_course in opened.items():
+		if not members.get(batch):
+			continue
+
+		subject = _("New lessons are open in {0}").format(batch_titles.get(batch) or batch)
+		message = _email_body(by_course, course_titles, lesson_titles)
+
+		# One mail per member: a shared recipient list would expose the cohort's
+		# addresses to each other.
+		for member in members[batch]:
+			frappe.sendmail(
+				recipients=[member],
+				subject=subject,
+				message=message,
+				reference_doctype="LMS Batch",
+				reference_name=batch,
+			)
+
+
+def _email_body(by_course: dict[str, list[str]], course_titles: dict, lesson_titles: dict) -> str:
+	escape = frappe.utils.escape_html
+	sections = []
+
+	for course, lessons in by_course.items():
+		items = "".join(f"<li>{escape(lesson_titles.get(l) or l)}</li>" for l in lessons)
+		sections.append(
+			f"""
+			<p>
+				<a href="{get_url()}/lms/courses/{course}">{escape(course_titles.get(course) or course)}</a>
+			</p>
+			<ul>{items}</ul>
+			"""
+		)
+
+	return f"""
+		<p>{_("The following lessons have just opened for you:")}</p>
+		{"".join(sections)}
+	"""
@@ -53,9 +53,7 @@ def _get_invite(key: str):
 
 
 def _batch_titles(invite) -> list[str]:
-	return [
-		frappe.db.get_value("LMS Batch", row.batch, "title") or row.batch for row in invite.batches
-	]
+	return invites.get_batch_titles(invite)
 
 
 def _accept_now(invite, context):